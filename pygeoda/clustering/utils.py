@@ -1,4 +1,37 @@
+from collections.abc import Mapping
 from ..libgeoda import gda_betweensumofsquare, gda_totalsumofsquare, gda_withinsumofsquare, flat_2dclusters
+from ..io import arrow_table, ArrowExport
+import numpy as np
+
+class ClusteringResult(Mapping, ArrowExport):
+    """The read-only mapping of clustering statistics returned by the clustering methods
+
+    It can be passed directly to pyarrow, Polars or DuckDB, which read the cluster
+    labels of the observations through the Arrow C Data Interface (`__arrow_c_stream__`).
+    It is not a dict, since pyarrow.table() would read a dict as columns instead.
+    """
+    def __init__(self, stats):
+        self._stats = dict(stats)
+
+    def __getitem__(self, key):
+        return self._stats[key]
+
+    def __iter__(self):
+        return iter(self._stats)
+
+    def __len__(self):
+        return len(self._stats)
+
+    def __repr__(self):
+        return repr(self._stats)
+
+    def to_arrow(self):
+        """Get the cluster labels as a pyarrow Table
+
+        Return:
+            :obj:`pyarrow.Table`: a table with the column Clusters
+        """
+        return arrow_table({"Clusters": np.asarray(self["Clusters"], dtype=np.int32)})
 
 def calculate_clustering_statistics(cluster_ids, in_data, num_obs):
     """Calculate clustering statistics including sum of squares measures.
@@ -26,11 +59,11 @@ def calculate_clustering_statistics(cluster_ids, in_data, num_obs):
     if len(within_ss) != len(cluster_ids):
         within_ss = [0]*(len(cluster_ids) - len(within_ss)) + list(within_ss)
 
-    return {
+    return ClusteringResult({
         "Total sum of squares": total_ss,
         "Within-cluster sum of squares": within_ss,
         "Total within-cluster sum of squares": sum(within_ss),
         "Total between-cluster sum of squares": between_ss,
         "The ratio of between to total sum of squares": ratio,
         "Clusters": flat_2dclusters(num_obs, cluster_ids),
-    }
+    })
@@ -2,14 +2,73 @@ import sys
 import string
 import random
 import math
+import numpy as np
+from collections import OrderedDict
 
 from .libgeoda import GeoDa, GeoDaTable, VecString, VecBool, VecInt64, VecDouble
 
 import os
+import hashlib
+import tempfile
+from .io import subset_shapefile, shapefile_fingerprint, ShapefileReader, polygon_centroids
+from .io import read_arrow, arrow_to_geoda_parts, layer_name_from_path, arrow_table, ArrowExport, ARROW_EXTENSIONS
+from .weights.spatial_index import SpatialIndex
+
 __author__ = "Xun Li <lixun910@gmail.com>"
 __all__ = ['geoda', 'open']
 
-class geoda:
+class _ColumnCache:
+    """
+    A memory-bounded LRU cache of materialized column values
+    """
+    def __init__(self, max_bytes=0):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._items = OrderedDict()
+
+    def get(self, key):
+        item = self._items.get(key)
+        if item is None:
+            return None
+        self._items.move_to_end(key)
+        return item[0]
+
+    def put(self, key, value, nbytes):
+        if nbytes > self.max_bytes:
+            return
+        if key in self._items:
+            self.nbytes -= self._items.pop(key)[1]
+        self._items[key] = (value, nbytes)
+        self.nbytes += nbytes
+        self._evict()
+
+    def resize(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._evict()
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes:
+            _, (_, old_nbytes) = self._items.popitem(last=False)
+            self.nbytes -= old_nbytes
+
+    def clear(self):
+        self._items.clear()
+        self.nbytes = 0
+
+    def __len__(self):
+        return len(self._items)
+
+def _column_nbytes(values):
+    """Estimate the memory used by a column held in the cache
+    """
+    if isinstance(values, np.ndarray):
+        if values.dtype == object:
+            return values.nbytes + sum(map(sys.getsizeof, values))
+        return values.nbytes
+    # SWIG tuples: the tuple itself plus one boxed Python object per value
+    return sys.getsizeof(values) + sum(map(sys.getsizeof, values))
+
+class geoda(ArrowExport):
     """
     A wrapper class of GeoDa class from libgeoda created from ESRI Shapefile
 
@@ -20,7 +79,7 @@ class geoda:
         field_types (dict): A dict of field types 
         map_type (str): The map type (Point, Polygon, LineString)
     """
-    def __init__(self, gda_obj):
+    def __init__(self, gda_obj, cache_size=0):
         """
         Constructor of geoda object.
 
@@ -28,9 +87,23 @@ class geoda:
         ----------
         gda_obj : Object
             An object / pointer of GeoDa class 
+        cache_size : int
+            The maximum number of bytes of column values kept in memory.
+            Defaults to 0 (no column cache).
         """
         self.gda = gda_obj
 
+        self._col_cache = _ColumnCache(cache_size)
+
+        self._gda_tbl = None
+        self._null_masks = None
+        self._fingerprint = None
+        self._geom_path = None
+        self._wkb = None
+        self._spatial_index = {}
+        self._min_distthreshold = {}
+        self._contiguity = {}
+
         self.num_obs = gda_obj.GetNumObs()
 
         self.num_cols = gda_obj.GetNumCols()
@@ -100,26 +173,64 @@ class geoda:
             :obj:`list` of :obj:`str`: a list of string values of selected column
         """
         if type(col_name) == list:
-            result = list()
-            ftypes = self.GetFieldTypes()
-            for item in col_name:
-                ft = ftypes[item]
-                if ft == "integer":
-                    result.append(self.GetIntegerCol(item))
-                elif ft == "real":
-                    result.append(self.GetRealCol(item))
-                else:
-                    result.append(self.GetStringCol(item))
-            return result
+            return [self[item] for item in col_name]
+
+        return self._get_column(col_name, "values", self._fetch_values)
+
+    def _fetch_values(self, col_name):
+        ft = self.field_types[col_name]
+        if ft == "integer":
+            return self.GetIntegerCol(col_name)
+        elif ft == "real":
+            return self.GetRealCol(col_name)
         else:
-            ftypes = self.GetFieldTypes()
-            ft = ftypes[col_name]
-            if ft == "integer":
-                return self.GetIntegerCol(col_name)
-            elif ft == "real":
-                return self.GetRealCol(col_name)
-            else:
-                return self.GetStringCol(col_name)
+            return self.GetStringCol(col_name)
+
+    def _get_column(self, col_name, kind, fetch):
+        """Get the values of a column through the column cache
+
+        Args:
+            col_name (str): the name of selected column
+            kind (str): the representation of the values, e.g. "values" or "array"
+            fetch (function): the function to read the values from libgeoda when they are not cached
+        """
+        cache = self._col_cache
+        if cache.max_bytes <= 0:
+            return fetch(col_name)
+
+        if len(cache) > 0 and self.GetNumCols() != self.num_cols:
+            self.invalidate_cache()
+
+        key = (col_name, kind)
+        values = cache.get(key)
+        if values is None:
+            values = fetch(col_name)
+            if isinstance(values, np.ndarray):
+                values.flags.writeable = False
+            cache.put(key, values, _column_nbytes(values))
+        return values
+
+    def set_cache_size(self, max_bytes):
+        """Set the memory limit of the column cache
+        Columns read by [] operator or column_array() are kept in a LRU cache
+        until the limit is reached. Arrays returned from the cache are read-only.
+
+        Args:
+            max_bytes (int): the maximum number of bytes of cached column values, 0 to disable the cache
+        """
+        if max_bytes < 0:
+            raise ValueError("The size of column cache has to be a non-negative integer number.")
+
+        self._col_cache.resize(max_bytes)
+
+    def invalidate_cache(self):
+        """Reload the schema of the table and drop all cached columns
+        Call it after the underlying GeoDa table has been changed.
+        """
+        self._col_cache.clear()
+        self.num_cols = self.GetNumCols()
+        self.field_names = self.GetFieldNames()
+        self.field_types = self.GetFieldTypes()
 
     def GetIntegerCol(self, col_name):
         """Get the integer values from a column
@@ -130,7 +241,7 @@ class geoda:
         """
         if not isinstance(col_name, str) or len(col_name) <= 0:
             raise ValueError("The column name is not valid or not existed.")
-        return self.gda.GetIntegerCol(col_name)
+        return self._fill_undefs(col_name, self.gda.GetIntegerCol(col_name), 0)
 
     def GetRealCol(self, col_name):
         """Get the real values from a column
@@ -141,7 +252,7 @@ class geoda:
         """
         if not isinstance(col_name, str) or len(col_name) <= 0:
             raise ValueError("The column name is not valid or not existed.")
-        return self.gda.GetNumericCol(col_name)
+        return self._fill_undefs(col_name, self.gda.GetNumericCol(col_name), 0.0)
 
     def GetStringCol(self, col_name):
         """Get the string values from a column
@@ -152,7 +263,7 @@ class geoda:
         """
         if not isinstance(col_name, str) or len(col_name) <= 0:
             raise ValueError("The column name is not valid or not existed.")
-        return self.gda.GetStringCol(col_name)
+        return self._fill_undefs(col_name, self.gda.GetStringCol(col_name), "")
 
     def GetUndefinedVals(self, col_name):
         """Get the undefined flags from a column
@@ -163,7 +274,148 @@ class geoda:
         """
         if not isinstance(col_name, str) or len(col_name) <= 0:
             raise ValueError("The column name is not valid or not existed.")
-        return self.gda.GetUndefinesCol(col_name)
+        return tuple(self._column_undefs(col_name).tolist())
+
+    def column_array(self, col_name):
+        """Get the values from a column as a NumPy array
+        Args:
+            :obj:`str`: the name of selected column
+        Return:
+            :obj:`numpy.ndarray`: an int64 (integer column), float64 (real column) or object (string column) array
+        """
+        if col_name not in self.field_types:
+            raise ValueError("The column name is not valid or not existed.")
+
+        return self._get_column(col_name, "array", self._fetch_array)
+
+    def _fetch_array(self, col_name):
+        ft = self.field_types[col_name]
+        if ft == "integer":
+            return np.fromiter(self.GetIntegerCol(col_name), dtype=np.int64, count=self.num_obs)
+        elif ft == "real":
+            return np.fromiter(self.GetRealCol(col_name), dtype=np.float64, count=self.num_obs)
+        else:
+            return np.array(self.GetStringCol(col_name), dtype=object)
+
+    def _fill_undefs(self, col_name, vals, fill):
+        """Put the undefined values of a column back
+        libgeoda skips the undefined cells of a DBF file, so a column with undefined values
+        has less than num_obs values: they are returned at the defined observations, and the
+        undefined observations get the fill value.
+
+        Return:
+            :obj:`tuple`: num_obs values
+        """
+        if len(vals) == self.num_obs:
+            return vals
+
+        undefs = self._column_undefs(col_name)
+        if len(vals) != self.num_obs - undefs.sum():
+            raise ValueError("The column {0} has {1} values for {2} defined observations."
+                             .format(col_name, len(vals), self.num_obs - undefs.sum()))
+        filled = np.full(self.num_obs, fill, dtype=object)
+        filled[~undefs] = vals
+        return tuple(filled.tolist())
+
+    def _column_undefs(self, col_name):
+        undefs = self.gda.GetNullValues(col_name)
+        if len(undefs) == self.num_obs:
+            return np.fromiter(undefs, dtype=bool, count=self.num_obs)
+
+        # libgeoda returns no undefined flags, so they are read from the table that the
+        # GeoDa object was created from, or from the DBF file as libgeoda reads it
+        if self._gda_tbl is not None:
+            col = self._gda_tbl.GetColumn(col_name)
+            if col is not None:
+                return np.fromiter(col.undefs, dtype=bool, count=self.num_obs)
+        if self._null_masks is not None:
+            return self._null_masks[col_name]
+        if self._geom_path is not None:
+            return ShapefileReader(self._geom_path).null_mask(col_name)
+        return np.zeros(self.num_obs, dtype=bool)
+
+    def null_mask(self, col_name):
+        """Get the undefined flags from a column as a NumPy array
+        Args:
+            :obj:`str`: the name of selected column
+        Return:
+            :obj:`numpy.ndarray`: a bool array, True if the value is undefined
+        """
+        if col_name not in self.field_types:
+            raise ValueError("The column name is not valid or not existed.")
+
+        return self._column_undefs(col_name)
+
+    def _arrow_column_names(self):
+        return list(self.field_names)
+
+    def to_arrow(self, columns=None):
+        """Get the columns as a pyarrow Table
+        The geoda object can also be passed directly to pyarrow, Polars or DuckDB,
+        which read it through the Arrow C Data Interface (`__arrow_c_stream__`).
+
+        Args:
+            columns (list, optional): the names of selected columns, default is all columns
+        Return:
+            :obj:`pyarrow.Table`: a table of the selected columns, undefined values are null
+        """
+        col_names = self._arrow_column_names() if columns is None else list(columns)
+        values = {nm: self.column_array(nm) for nm in col_names}
+        masks = {nm: self.null_mask(nm) for nm in col_names}
+        return arrow_table(values, masks)
+
+    def fingerprint(self):
+        """Get a content hash of the geometries
+        It identifies the dataset in the spatial weights cache (see set_weights_cache()).
+
+        Return:
+            :obj:`str`: a hex digest, or None if the geometries are unknown
+        """
+        if self._fingerprint is None and self._geom_path is not None:
+            self._fingerprint = shapefile_fingerprint(self._geom_path)
+        return self._fingerprint
+
+    def _vertices(self):
+        """Get the vertices of the polygons, used by the multi-threaded contiguity weights
+
+        Return:
+            :obj:`tuple`: a (m, 2) array of points, the index of the polygon and the index of the ring
+                of every point, or None if the layer is not polygons or the vertices are unknown
+        """
+        if self._geom_path is None:
+            return None
+        return _shapefile_vertices(ShapefileReader(self._geom_path))
+
+    def _centroids(self):
+        """Get the centroids (or points) of the geometries, used by the spatial index
+
+        Return:
+            :obj:`ndarray`: a (n, 2) array of centroids, or None if the geometries are unknown
+        """
+        if self._geom_path is None:
+            return None
+        return ShapefileReader(self._geom_path).centroids()
+
+    def spatial_index(self, is_arc=False, is_mile=True):
+        """Get the spatial index (kd-tree) of the centroids
+        The index is built on first use and kept for every distance setting, so that the
+        distance and k-nearest neighbors based weights of this dataset share it.
+
+        Args:
+            is_arc (bool, optional): A bool flag indicates if compute arc distance or Euclidean distance. Defaults to False (Euclidean distance)
+            is_mile (bool, optional): A bool flag indicates if the distance unit is mile or km. Defaults to True (mile).
+
+        Return:
+            :obj:`SpatialIndex`: the spatial index, or None if the centroids are unknown
+        """
+        # the Euclidean distance does not depend on the unit
+        key = (bool(is_arc), bool(is_mile) if is_arc else True)
+        if key not in self._spatial_index:
+            centroids = self._centroids()
+            if centroids is not None and np.isnan(centroids).any():
+                centroids = None
+            self._spatial_index[key] = None if centroids is None else SpatialIndex(centroids, *key)
+        return self._spatial_index[key]
 
     def __repr__(self):
         info = ""
@@ -172,14 +424,115 @@ class geoda:
         info += "\t Number of fields: {0}\n".format(self.num_cols)
         info += "\t Geometry type(s): {0}\n".format(self.map_type)
         info += '{0:>24} {1:>28}\n'.format("field name:", "field type (shapfile):") 
-        ftypes = self.GetFieldTypes()
-        for fn, ft in ftypes.items():
+        for fn, ft in self.field_types.items():
             info += '{0:>24} {1:>28}\n'.format(fn, ft)
         return info
 
 def id_generator(size=6, chars=string.ascii_uppercase + string.digits):
     return ''.join(random.choice(chars) for _ in range(size))
 
+def _add_table_column(gda_tbl, col_nm, col):
+    """Add a pandas column to a GeoDaTable with a single call.
+
+    The values and the null mask are converted to flat NumPy arrays first, so
+    that the copy into the std::vector happens inside the SWIG wrapper instead
+    of a Python loop over every cell.
+
+    Args:
+        gda_tbl (GeoDaTable): The table that the column is added to.
+        col_nm (str): The name of the column.
+        col (Series): A pandas Series with the values of the column. The missing
+            values (NaN, None, pandas.NA) are marked as undefined.
+    """
+    from pandas.api.types import is_bool_dtype, is_float_dtype, is_integer_dtype
+
+    undefs = col.isna().to_numpy(dtype=bool)
+
+    if is_float_dtype(col.dtype):
+        vals = col.to_numpy(dtype=np.float64, na_value=0.0)
+        gda_tbl.AddRealColumn(col_nm, vals.tolist(), undefs.tolist())
+    elif is_integer_dtype(col.dtype) or is_bool_dtype(col.dtype):
+        # a bool column is added as 0/1, as a libgeoda table has no bool type
+        vals = col.to_numpy(dtype=np.int64, na_value=0)
+        gda_tbl.AddIntColumn(col_nm, vals.tolist(), undefs.tolist())
+    else:
+        vals = col.to_numpy(dtype=object)
+        vals = np.where(undefs, "", vals).astype(str)
+        gda_tbl.AddStringColumn(col_nm, vals.tolist(), undefs.tolist())
+
+def _geoseries_to_wkb(geoms):
+    """Encode a GeoSeries as one contiguous WKB buffer.
+
+    All geometries are encoded by a single vectorized shapely call, and the
+    blobs are joined into one buffer instead of being copied slice by slice.
+
+    Args:
+        geoms (GeoSeries): The geometries to encode.
+
+    Returns:
+        tuple: A bytearray with the concatenated WKB blobs and an int64 array of
+            n + 1 offsets, where the i-th geometry is buffer[offsets[i]:offsets[i+1]]
+    """
+    import shapely
+
+    wkbs = shapely.to_wkb(np.asarray(geoms, dtype=object))
+
+    offsets = np.zeros(len(wkbs) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, wkbs), dtype=np.int64, count=len(wkbs)), out=offsets[1:])
+
+    return bytearray(b"".join(wkbs)), offsets
+
+def _shapefile_vertices(reader):
+    if reader.shape_type % 10 != 5:
+        return None
+    return reader.points()
+
+def _geoseries_vertices(geoms):
+    import shapely
+
+    parts, part_rec = shapely.get_parts(np.asarray(geoms), return_index=True)
+    if len(parts) == 0 or not np.all(shapely.get_type_id(parts) == 3):
+        return None
+    rings, ring_part = shapely.get_rings(parts, return_index=True)
+    points, point_ring = shapely.get_coordinates(rings, return_index=True)
+    return points, part_rec[ring_part][point_ring], point_ring
+
+def _geoseries_centroids(geoms):
+    import shapely
+
+    # the polygons as libgeoda reads them from the WKB (see polygon_centroids())
+    vertices = _geoseries_vertices(geoms)
+    if vertices is not None:
+        return polygon_centroids(*vertices, len(geoms))
+    centroids = shapely.centroid(np.asarray(geoms))
+    return np.column_stack([shapely.get_x(centroids), shapely.get_y(centroids)])
+
+def _wkb_fingerprint(wkb_bytes, wkb_offsets):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.ascontiguousarray(wkb_offsets, dtype=np.int64))
+    h.update(wkb_bytes)
+    return h.hexdigest()
+
+def _create_geoda(gda_tbl, layer_name, map_type, wkb_bytes, wkb_offsets):
+    """Create a libgeoda GeoDa instance from a contiguous WKB buffer.
+
+    The buffer is passed to GeoDa() as a vector<unsigned char> together with the
+    size of every blob, so the geometries are not encoded one by one.
+
+    Args:
+        gda_tbl (GeoDaTable): The table content of the layer.
+        layer_name (str): The name of the layer.
+        map_type (str): One of "map_polygons", "map_points" or "map_lines".
+        wkb_bytes (bytearray): The concatenated WKB blobs of all geometries.
+        wkb_offsets (array): The n + 1 offsets of the blobs in wkb_bytes.
+
+    Returns:
+        GeoDa: An instance of libgeoda GeoDa class.
+    """
+    wkb_size = np.diff(wkb_offsets).astype(np.int32)
+
+    return GeoDa(gda_tbl, layer_name, map_type, wkb_bytes, wkb_size.tolist())
+
 def geopandas_to_geoda(gdf, with_table=False):
     """Create a geoda instance from geopandas object.
 
@@ -212,56 +565,18 @@ def geopandas_to_geoda(gdf, with_table=False):
             col_nm = str(col_nms[i])
             if col_nm == 'geometry':
                 continue
-            col_type = gdf[col_nm].dtype
-            vals = gdf[col_nm].to_list()
-            if col_type == 'float64' or col_type == 'float':
-                vf = VecDouble(n_rows)
-                undef = VecBool(n_rows)
-                for i in range(n_rows):
-                    vf[i] = vals[i]
-                    undef[i] = vals[i] == None
-                gda_tbl.AddRealColumn(col_nm, vf, undef)
-            elif col_type == 'int64' or col_type == 'int':
-                vi = VecInt64(n_rows)
-                undef = VecBool(n_rows)
-                for i in range(n_rows):
-                    vi[i] = vals[i]
-                    undef[i] = vals[i] == None
-                gda_tbl.AddIntColumn(col_nm, vi, undef)
-            else:
-                vs = VecString(n_rows)
-                undef = VecBool(n_rows)
-                for i in range(n_rows):
-                    undef[i] = vals[i] == None
-                    if undef[i] == False:
-                        vs[i] = vals[i]
-                gda_tbl.AddStringColumn(col_nm, vs, undef)
+            _add_table_column(gda_tbl, col_nm, gdf[col_nms[i]])
 
     # Geoms
-    wkb_size = []
-    wkb_array = []
-    wkb_bytecount = 0
-    for i in range(n_rows):
-        wkb = geoms[i].wkb
-        wkb_array.append(wkb)
-        wkb_size.append(len(wkb))
-        wkb_bytecount += wkb_size[-1]
-
-    #wkb_bytes = bytes(wkb_bytecount)
-    wkb_bytes = bytearray(wkb_bytecount)
-    if sys.version_info[0] < 3: wkb_bytes = bytearray()
-    start = 0
-    for i in range(n_rows):
-        wkb_bytes[start: start + wkb_size[i]] = wkb_array[i]
-        start += wkb_size[i]
-        
+    wkb_bytes, wkb_offsets = _geoseries_to_wkb(geoms)
 
     # map type
-    if gdf.geom_type[0].endswith("Polygon"):
+    geom_type = gdf.geom_type.iloc[0]
+    if geom_type.endswith("Polygon"):
         map_type = "map_polygons"
-    elif gdf.geom_type[0].endswith("Point"):
+    elif geom_type.endswith("Point"):
         map_type = "map_points" 
-    elif gdf.geom_type[0].endswith("Line"):
+    elif geom_type.endswith("LineString"):
         map_type = "map_lines" 
     else:
         raise ValueError("Error: pygeoda only supports geometry type of Polygon and Point.")
@@ -270,60 +585,286 @@ def geopandas_to_geoda(gdf, with_table=False):
     layer_name = id_generator()
 
     # projection will be NOT handled in libgeoda
-    gda = GeoDa(gda_tbl, layer_name, map_type, wkb_bytes, wkb_size)
+    gda = _create_geoda(gda_tbl, layer_name, map_type, wkb_bytes, wkb_offsets)
+
+    gda_obj = geoda(gda)
+    # the GeoDa object refers to the table, so it is kept alive with the geoda object
+    gda_obj._gda_tbl = gda_tbl
+    gda_obj._wkb = (wkb_bytes, wkb_offsets)
+    gda_obj._fingerprint = _wkb_fingerprint(wkb_bytes, wkb_offsets)
+    return gda_obj
 
-    return geoda(gda)
+def arrow_to_geoda(table, layer_name=None):
+    """Create a geoda instance from a pyarrow Table.
+
+    The WKB geometry column (see GeoParquet "geo" metadata) is passed to libgeoda
+    directly from the Arrow data buffer, and every attribute column is added to
+    the table with a single call.
+
+    Args:
+        table (pyarrow.Table): A table with a WKB geometry column.
+        layer_name (str, optional): The name of the layer.
+
+    Returns:
+        (geoda): An instance of geoda class.
+    """
+    gda_tbl, map_type, wkb_bytes, wkb_offsets = arrow_to_geoda_parts(table)
+
+    if layer_name is None:
+        layer_name = id_generator()
+
+    gda = _create_geoda(gda_tbl, layer_name, map_type, wkb_bytes, wkb_offsets)
+
+    gda_obj = geoda(gda)
+    # the GeoDa object refers to the table, so it is kept alive with the geoda object
+    gda_obj._gda_tbl = gda_tbl
+    gda_obj._wkb = (wkb_bytes, wkb_offsets)
+    gda_obj._fingerprint = _wkb_fingerprint(wkb_bytes, wkb_offsets)
+    return gda_obj
 
 def geoda_to_geopandas(geoda_obj):
     """Create a geopandas object from a geoda object.
 
+    libgeoda doesn't return the geometries, so they are decoded from the WKB that the geoda
+    object was created from, or read from its ESRI shapefile.
+
     Args:
         geoda_obj (geoda): An instance of geoda class.
     
     Returns:
         (GeoDataFrame): An instance of geopandas class.
     """
-    gda = geoda_obj.gda
-
-    n_cols = gda.GetNumCols()
-    col_nms = gda.GetFieldNames()
-    col_tps = gda.GetFieldTypes()
+    try:
+        import pandas
+        import geopandas
+        import shapely
+    except ImportError:
+        raise ImportError("geoda_to_geopandas() requires pandas, GeoPandas and shapely. Please install GeoPandas.")
+
+    if isinstance(geoda_obj, geodaGpd):
+        return geoda_obj.df.copy()
+
+    crs = None
+    if geoda_obj._wkb is not None:
+        # geometries: decode all WKB blobs with one vectorized call
+        wkb_bytes, wkb_offsets = geoda_obj._wkb
+        wkb_bytes = bytes(wkb_bytes)
+        wkbs = np.empty(len(wkb_offsets) - 1, dtype=object)
+        wkbs[:] = [wkb_bytes[s:e] for s, e in zip(wkb_offsets[:-1].tolist(), wkb_offsets[1:].tolist())]
+        geoms = shapely.from_wkb(wkbs)
+    elif geoda_obj._geom_path is not None:
+        shp = geopandas.read_file(geoda_obj._geom_path, columns=[])
+        geoms, crs = shp.geometry.values, shp.crs
+    else:
+        raise ValueError("The geometries of this geoda object are unknown.")
 
-    # pandas DF
+    # pandas DF: every column is built from one NumPy array
     data = {}
-    for i in range(n_cols):
-        c_nm = col_nms[i]
-        c_tp = col_tps[i]
-        if c_tp == "integer":
-            data[c_nm] = gda.GetIntegerCol(c_nm)
-        elif c_tp == "numeric":
-            data[c_nm] = gda.GetNumericCol(c_nm)
-        else:
-            if sys.version_info[0] < 3: 
-                vals = gda.GetStringCol(c_nm)
-                vals = [str(i) for i in vals]
-                data[c_nm] = vals
+    for c_nm in geoda_obj.field_names:
+        data[c_nm] = geoda_obj.column_array(c_nm)
+    df = pandas.DataFrame(data, copy=False)
+
+    # projection
+    return geopandas.GeoDataFrame(df, geometry=geoms, crs=crs)
+
+class geodaShp(geoda):
+    """
+    A wrapper class of GeoDa class from libgeoda created lazily from ESRI Shapefile
+
+    The .shp, .shx and .dbf files are memory-mapped: columns are decoded from the DBF
+    file when they are read, and the libgeoda GeoDa object is only created when it is
+    needed, e.g. by a spatial weights function.
+
+    Attributes:
+        num_obs (int): The number of observations
+        num_cols (int): The number of columns
+        field_names (tuple): A list of field names 
+        field_types (dict): A dict of field types 
+        map_type (str): The map type (Point, Polygon, LineString)
+        reader (ShapefileReader): The memory-mapped reader of the shapefile
+    """
+    def __init__(self, ds_path, cache_size=0):
+        self.ds_path = ds_path
+        self.reader = ShapefileReader(ds_path)
+        self._gda = None
+
+        self._col_cache = _ColumnCache(cache_size)
+
+        self._fingerprint = None
+        self._geom_path = ds_path
+        self._wkb = None
+        self._spatial_index = {}
+        self._min_distthreshold = {}
+        self._contiguity = {}
+
+        self.num_obs = self.reader.num_obs
+
+        self.num_cols = self.GetNumCols()
+
+        self.field_names = self.GetFieldNames()
+
+        self.field_types = self.GetFieldTypes()
+
+        self.map_type = self.GetMapType()
+
+    @property
+    def gda(self):
+        """The libgeoda GeoDa object, created on first access
+        """
+        if self._gda is None:
+            self._gda = GeoDa(self.ds_path)
+        return self._gda
+
+    def _vertices(self):
+        return _shapefile_vertices(self.reader)
+
+    def _centroids(self):
+        return self.reader.centroids()
+
+    def GetNumCols(self):
+        """
+        Get the number of columns
+
+        Returns
+        -------
+        : int
+            the number of columns
+        """
+        return len(self.reader.fields)
+
+    def GetNumObs(self):
+        """Get the number of observations
+
+        Return:
+            int: thu number of observations
+        """
+        return self.reader.num_obs
+
+    def GetFieldNames(self):
+        """Get the field names of all columns
+
+        Return:
+            :obj:`list` of :obj:`str`: a list of field names 
+        """
+        return tuple(f.name for f in self.reader.fields)
+
+    def GetFieldTypes(self):
+        """Get the field types (integer, real, string) of all columns
+
+        Return:
+            :obj:`list` of :obj:`str`: a list of field types
+        """
+        newtypes = {}
+        for f in self.reader.fields:
+            # as libgeoda (shapelib), a N field is integer only without decimals and with less than 10 digits
+            if f.type == 'N' and f.decimals == 0 and f.length < 10:
+                newtypes[f.name] = "integer"
+            elif f.type in ('N', 'F'):
+                newtypes[f.name] = "real"
             else:
-                data[c_nm] = gda.GetStringCol(c_nm)
-    df = pandas.DataFrame(data)
+                newtypes[f.name] = "string"
+        return newtypes
 
-    # geometries
-    geoms = []
-    wkb_array = gda.GetGeometryWKB()
-    for wkb in wkb_array:
-        if sys.version_info[0] < 3: wkb = bytearray(wkb)
-        shapely_obj = shapely.wkb.loads(bytes(wkb))
-        geoms.append(shapely_obj)
+    def GetMapType(self):
+        """Get the map type
 
-    gdf = geopandas.GeoDataFrame(df, geometry=geoms)
+        Return:
+            :obj:`str`: map type
+        """
+        shape_type = self.reader.shape_type % 10
+        if shape_type == 1 or shape_type == 8:
+            return "Point"
+        elif shape_type == 3:
+            return "LineString"
+        elif shape_type == 5:
+            return "Polygon"
+        return "Unknown"
 
-    # projection
-    return gdf
+    def GetIntegerCol(self, col_name):
+        """Get the integer values from a column
+        Args:
+            :obj:`str`: the name of selected column
+        Return:
+            :obj:`list` of int: a list of integer values of selected column
+        """
+        if not isinstance(col_name, str) or len(col_name) <= 0:
+            raise ValueError("The column name is not valid or not existed.")
+        return tuple(self._fetch_values_as(col_name, np.int64, 0).tolist())
+
+    def GetRealCol(self, col_name):
+        """Get the real values from a column
+        Args:
+            :obj:`str`: the name of selected column
+        Return:
+            :obj:`list` of float: a list of float values of selected column
+        """
+        if not isinstance(col_name, str) or len(col_name) <= 0:
+            raise ValueError("The column name is not valid or not existed.")
+        return tuple(self._fetch_values_as(col_name, np.float64, 0.0).tolist())
+
+    def GetStringCol(self, col_name):
+        """Get the string values from a column
+        Args:
+            :obj:`str`: the name of selected column
+        Return:
+            :obj:`list` of :obj:`str`: a list of string values of selected column
+        """
+        if not isinstance(col_name, str) or len(col_name) <= 0:
+            raise ValueError("The column name is not valid or not existed.")
+        return tuple(self._fetch_values_as(col_name, str, "").tolist())
+
+    def GetUndefinedVals(self, col_name):
+        """Get the undefined flags from a column
+        Args:
+            :obj:`str`: the name of selected column
+        Return:
+            :obj:`list` of :obj:`bool`: a list of bool flags indicating if the values are undefined of selected column
+        """
+        if not isinstance(col_name, str) or len(col_name) <= 0:
+            raise ValueError("The column name is not valid or not existed.")
+        return tuple(self.reader.null_mask(col_name).tolist())
+
+    def _fetch_array(self, col_name):
+        ft = self.field_types[col_name]
+        if ft == "integer":
+            return self._fetch_values_as(col_name, np.int64, 0)
+        elif ft == "real":
+            return self._fetch_values_as(col_name, np.float64, 0.0)
+        else:
+            return self._fetch_values_as(col_name, str, "").astype(object)
+
+    def _fetch_values_as(self, col_name, dtype, fill):
+        """Decode a column with the undefined values (see null_mask()) set to fill, as the
+        eager geoda object returns them
+        """
+        vals = self.reader.column(col_name)
+        undefs = self.reader.null_mask(col_name)
+        if vals.dtype.kind == 'f' and dtype is np.int64:
+            # NaN has no integer value
+            vals = np.where(np.isnan(vals), 0, vals)
+        vals = vals.astype(dtype)
+        vals[undefs] = fill
+        return vals
+
+    def null_mask(self, col_name):
+        """Get the undefined flags from a column as a NumPy array
+        Args:
+            :obj:`str`: the name of selected column
+        Return:
+            :obj:`numpy.ndarray`: a bool array, True if the value is undefined
+        """
+        if col_name not in self.field_types:
+            raise ValueError("The column name is not valid or not existed.")
+
+        return self.reader.null_mask(col_name)
 
 class geodaGpd(geoda):
     """
     A wrapper class of GeoDa class from libgeoda created from a geopandas object 
 
+    The columns are read from the GeoDataFrame directly, and the libgeoda GeoDa object
+    is only created when it is needed, e.g. by a spatial weights function.
+
     Attributes:
         num_obs (int): The number of observations
         num_cols (int): The number of columns
@@ -332,9 +873,17 @@ class geodaGpd(geoda):
         map_type (str): The map type (Point, Polygon, LineString)
     """
     def __init__(self, gpd_obj):
-        self.gp = geopandas_to_geoda(gpd_obj)
-        self.gda = self.gp.gda
         self.df = gpd_obj
+        self._gp = None
+
+        self._col_cache = _ColumnCache(0)
+
+        self._fingerprint = None
+        self._geom_path = None
+        self._wkb = None
+        self._spatial_index = {}
+        self._min_distthreshold = {}
+        self._contiguity = {}
 
         self.num_obs = len(self.df)
 
@@ -346,6 +895,38 @@ class geodaGpd(geoda):
 
         self.map_type = self.GetMapType()
 
+    @property
+    def gp(self):
+        """The geoda object converted from the GeoDataFrame, created on first access
+        """
+        if self._gp is None:
+            self._gp = geopandas_to_geoda(self.df)
+        return self._gp
+
+    @property
+    def gda(self):
+        """The libgeoda GeoDa object, created on first access
+        """
+        return self.gp.gda
+
+    def fingerprint(self):
+        """Get a content hash of the geometries
+        It identifies the dataset in the spatial weights cache (see set_weights_cache()).
+
+        Return:
+            :obj:`str`: a hex digest
+        """
+        if self._fingerprint is None:
+            self._fingerprint = self.gp.fingerprint() if self._gp is not None else \
+                _wkb_fingerprint(*_geoseries_to_wkb(self.df.geometry))
+        return self._fingerprint
+
+    def _vertices(self):
+        return _geoseries_vertices(self.df.geometry)
+
+    def _centroids(self):
+        return _geoseries_centroids(self.df.geometry)
+
     def GetNumCols(self):
         """
         Get the number of columns
@@ -440,7 +1021,35 @@ class geodaGpd(geoda):
         if not isinstance(col_name, str) or len(col_name) <= 0:
             raise ValueError("The column name is not valid or not existed.")
 
-        return [i==math.nan for i in self.df[col_name]]
+        return self.null_mask(col_name).tolist()
+
+    def column_array(self, col_name):
+        """Get the values from a column as a NumPy array
+        Args:
+            :obj:`str`: the name of selected column
+        Return:
+            :obj:`numpy.ndarray`: the values of selected column
+        """
+        if col_name not in self.df.columns:
+            raise ValueError("The column name is not valid or not existed.")
+
+        return self.df[col_name].to_numpy()
+
+    def null_mask(self, col_name):
+        """Get the undefined flags from a column as a NumPy array
+        Args:
+            :obj:`str`: the name of selected column
+        Return:
+            :obj:`numpy.ndarray`: a bool array, True if the value is undefined
+        """
+        if col_name not in self.df.columns:
+            raise ValueError("The column name is not valid or not existed.")
+
+        return self.df[col_name].isna().to_numpy(dtype=bool)
+
+    def _arrow_column_names(self):
+        geom_name = self.df.geometry.name
+        return [nm for nm in self.field_names if nm != geom_name]
 
     def __repr__(self):
         info = ""
@@ -454,29 +1063,71 @@ class geodaGpd(geoda):
             info += '{0:>24} {1:>30}\n'.format(fn, ft.name)
         return info
 
-def open(data_source):
+def open(data_source, *, columns=None, bbox=None, where=None, lazy=False):
     """Create a geoda object by reading a spatial dataset: either ESRI Shapefile or GeoPandas object.
 
     Args:
-        data_source (object): The data_source could be either the file path of the ESRI shapefile or a geopandas dataframe object.
+        data_source (object): The data_source could be the file path of an ESRI shapefile, a GeoParquet (.parquet) or
+            Arrow IPC (.arrow, .feather) file, a geopandas dataframe object or a pyarrow Table with a WKB geometry column.
+        columns (list, optional): The names of the fields to read from the ESRI shapefile. Defaults to all fields.
+        bbox (tuple, optional): (minx, miny, maxx, maxy), only read the features of the ESRI shapefile whose
+            bounding box intersects it.
+        where (function, optional): A function that takes a dict-like object of field values (NumPy arrays, decoded
+            on access) and returns a boolean array to select the features of the ESRI shapefile,
+            e.g. lambda t: t['STATE_NAME'] == 'Illinois'
+        lazy (bool, optional): A bool flag indicates if the ESRI shapefile is memory-mapped and read on demand.
+            The libgeoda object is then only created when it is needed, e.g. by spatial weights functions.
+            Defaults to False.
 
     Return:
         :obj:`Object`: An object of geoda instance
     """
+    has_options = columns is not None or bbox is not None or where is not None or lazy
+    if has_options and not (isinstance(data_source, str) and data_source.lower().endswith('.shp')):
+        raise ValueError("The columns, bbox, where and lazy options can only be used with an ESRI shapefile.")
+
     if isinstance(data_source, str):
         ds_path = data_source
         if not isinstance(ds_path, str) or len(ds_path) <= 0:
             raise ValueError("The input path of data source is not valid")
+        if ds_path.lower().endswith(ARROW_EXTENSIONS):
+            if not os.path.exists(ds_path):
+                raise ValueError("The input path of data source is not valid")
+            return arrow_to_geoda(read_arrow(ds_path), layer_name_from_path(ds_path))
         if not ds_path.lower().endswith('.shp'):
-            raise ValueError('Pygeoda can only open ESRI shapefile since v0.0.4')
+            raise ValueError('Pygeoda can only open ESRI shapefile, GeoParquet or Arrow IPC files')
         if not os.path.exists(ds_path[0:-3]+'dbf'):
             raise ValueError('This shapefile miss a DBF file')
         if not os.path.exists(ds_path[0:-3]+'shx'):
             raise ValueError('This shapefile miss a SHX file')
-        gda_obj = GeoDa(ds_path)
 
-        return geoda(gda_obj)
+        if lazy:
+            if columns is not None or bbox is not None or where is not None:
+                raise ValueError("The lazy mode can't be used together with columns, bbox or where.")
+            return geodaShp(ds_path)
+
+        if columns is None and bbox is None and where is None:
+            gda = geoda(GeoDa(ds_path))
+            gda._geom_path = ds_path
+            return gda
+
+        # only the selected fields and features are passed to libgeoda
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp_path = os.path.join(tmp_dir, os.path.basename(ds_path))
+            subset_shapefile(ds_path, tmp_path, columns, bbox, where)
+            gda = geoda(GeoDa(tmp_path))
+            gda._fingerprint = shapefile_fingerprint(tmp_path)
+            # the undefined flags are read from the DBF file before it is removed
+            reader = ShapefileReader(tmp_path)
+            gda._null_masks = dict((f.name, reader.null_mask(f.name)) for f in reader.fields)
+            del reader
+
+        return gda
         
+    # a pyarrow Table with a WKB geometry column
+    if type(data_source).__name__ == "Table" and type(data_source).__module__.startswith("pyarrow"):
+        return arrow_to_geoda(data_source)
+
     # else try to open a geopandas object
     try:
         import geopandas
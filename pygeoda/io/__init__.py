@@ -0,0 +1,5 @@
+"""
+A module for reading spatial datasets
+"""
+from .shapefile import subset_shapefile, shapefile_fingerprint, ShapefileReader, polygon_centroids
+from .arrow import read_arrow, arrow_to_geoda_parts, layer_name_from_path, arrow_table, ArrowExport, ARROW_EXTENSIONS
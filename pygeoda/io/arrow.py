@@ -0,0 +1,199 @@
+import os
+import abc
+import json
+import numpy as np
+
+from ..libgeoda import GeoDaTable
+
+__author__ = "Xun Li <lixun910@gmail.com>"
+
+ARROW_EXTENSIONS = ('.parquet', '.geoparquet', '.arrow', '.feather', '.ipc')
+
+# WKB geometry type (without Z/M flags) -> libgeoda map type
+WKB_MAP_TYPES = {
+    1: "map_points", 4: "map_points",
+    2: "map_lines", 5: "map_lines",
+    3: "map_polygons", 6: "map_polygons",
+}
+
+def read_arrow(ds_path):
+    """Read a GeoParquet or Arrow IPC (Feather v2) file into a pyarrow Table
+
+    Args:
+        ds_path (str): The path of a .parquet/.geoparquet or .arrow/.feather/.ipc file
+
+    Returns:
+        pyarrow.Table: The content of the file. Arrow IPC files are memory-mapped.
+    """
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("pyarrow is required to read GeoParquet and Arrow files. Please install pyarrow.")
+
+    if ds_path.lower().endswith(('.parquet', '.geoparquet')):
+        import pyarrow.parquet
+        return pyarrow.parquet.read_table(ds_path, memory_map=True)
+
+    import pyarrow.feather
+    return pyarrow.feather.read_table(ds_path, memory_map=True)
+
+def geometry_column_name(table):
+    """Get the name of the WKB geometry column of a pyarrow Table
+    The GeoParquet "geo" metadata is used if present, otherwise a binary column named "geometry".
+    """
+    metadata = table.schema.metadata or {}
+    if b'geo' in metadata:
+        geo = json.loads(metadata[b'geo'])
+        name = geo.get('primary_column', 'geometry')
+        encoding = geo.get('columns', {}).get(name, {}).get('encoding', 'WKB')
+        if encoding.upper() != 'WKB':
+            raise ValueError("pygeoda only supports WKB encoded geometries, but '{0}' is {1}.".format(name, encoding))
+        return name
+
+    if 'geometry' in table.column_names:
+        return 'geometry'
+    raise ValueError("No WKB geometry column is found in the Arrow table.")
+
+def wkb_column_buffers(column):
+    """Get the contiguous WKB buffer and offsets of a binary Arrow column
+
+    The data buffer of the Arrow array already holds all WKB blobs back to back, so
+    it is used as is instead of encoding or copying the geometries one by one.
+
+    Args:
+        column (pyarrow.ChunkedArray or pyarrow.Array): A binary or large_binary column of WKB
+
+    Returns:
+        tuple: A bytearray of the concatenated WKB blobs and an int64 array of n + 1 offsets
+    """
+    if hasattr(column, 'combine_chunks'):
+        column = column.combine_chunks()
+    if column.null_count > 0:
+        raise ValueError("The geometry column contains null geometries.")
+
+    _, offsets_buf, data_buf = column.buffers()[:3]
+    offset_type = np.int64 if column.type.id == _large_binary_type_id() else np.int32
+    offsets = np.frombuffer(offsets_buf, dtype=offset_type)[column.offset:column.offset + len(column) + 1]
+    offsets = offsets.astype(np.int64)
+
+    start, end = int(offsets[0]), int(offsets[-1])
+    wkb_bytes = bytearray(memoryview(data_buf)[start:end])
+    return wkb_bytes, offsets - start
+
+def _large_binary_type_id():
+    import pyarrow
+    return pyarrow.large_binary().id
+
+def wkb_map_type(wkb_bytes):
+    """Get the libgeoda map type from the geometry type of the first WKB blob
+    """
+    if len(wkb_bytes) < 5:
+        raise ValueError("The geometry column is empty.")
+    byte_order = '<u4' if wkb_bytes[0] == 1 else '>u4'
+    geom_type = int(np.frombuffer(bytes(wkb_bytes[1:5]), dtype=byte_order)[0])
+    # drop the EWKB flags and the ISO Z/M codes (e.g. 1003 -> 3)
+    geom_type = (geom_type & 0x0FFFFFFF) % 1000
+    if geom_type not in WKB_MAP_TYPES:
+        raise ValueError("Error: pygeoda only supports geometry type of Polygon, Point and LineString.")
+    return WKB_MAP_TYPES[geom_type]
+
+def _add_arrow_column(gda_tbl, col_nm, column):
+    """Add an Arrow column to a GeoDaTable with a single call.
+    Columns without nulls are viewed as NumPy arrays without copying the Arrow buffers.
+    """
+    import pyarrow
+    import pyarrow.compute
+
+    undefs = column.is_null().to_numpy(zero_copy_only=False)
+    col_type = column.type
+
+    if pyarrow.types.is_floating(col_type) or pyarrow.types.is_decimal(col_type):
+        if column.null_count > 0:
+            column = pyarrow.compute.fill_null(column, 0)
+        vals = column.to_numpy(zero_copy_only=False).astype(np.float64, copy=False)
+        gda_tbl.AddRealColumn(col_nm, vals.tolist(), undefs.tolist())
+    elif pyarrow.types.is_integer(col_type):
+        if column.null_count > 0:
+            column = pyarrow.compute.fill_null(column, 0)
+        vals = column.to_numpy(zero_copy_only=False).astype(np.int64, copy=False)
+        gda_tbl.AddIntColumn(col_nm, vals.tolist(), undefs.tolist())
+    else:
+        column = pyarrow.compute.fill_null(column.cast(pyarrow.string()), "")
+        gda_tbl.AddStringColumn(col_nm, column.to_pylist(), undefs.tolist())
+
+def arrow_to_geoda_parts(table, with_table=True):
+    """Convert a pyarrow Table to the parts needed to create a libgeoda GeoDa object
+
+    Args:
+        table (pyarrow.Table): A table with a WKB geometry column
+        with_table (bool): A boolean flag indicates if copy the table content to the GeoDaTable
+
+    Returns:
+        tuple: (GeoDaTable, map type, WKB buffer, WKB offsets)
+    """
+    geom_nm = geometry_column_name(table)
+
+    gda_tbl = GeoDaTable()
+    if with_table:
+        for col_nm in table.column_names:
+            if col_nm == geom_nm:
+                continue
+            _add_arrow_column(gda_tbl, str(col_nm), table.column(col_nm))
+
+    wkb_bytes, wkb_offsets = wkb_column_buffers(table.column(geom_nm))
+    map_type = wkb_map_type(wkb_bytes)
+
+    return gda_tbl, map_type, wkb_bytes, wkb_offsets
+
+def layer_name_from_path(ds_path):
+    """Get the layer name (file name without extension) of a dataset
+    """
+    return os.path.splitext(os.path.basename(ds_path))[0]
+
+def arrow_table(columns, masks=None):
+    """Build a pyarrow Table from NumPy arrays
+
+    Numeric arrays without a null mask are wrapped by Arrow without copying.
+
+    Args:
+        columns (dict): column name -> NumPy array
+        masks (dict, optional): column name -> bool array, True if the value is null
+
+    Returns:
+        pyarrow.Table: A table that can be exported through the Arrow C Data Interface
+    """
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("pyarrow is required to export data through Apache Arrow. Please install pyarrow.")
+
+    masks = {} if masks is None else masks
+    arrays = []
+    for name, values in columns.items():
+        mask = masks.get(name)
+        if mask is not None and not mask.any():
+            mask = None
+        arrays.append(pyarrow.array(values, mask=mask))
+
+    return pyarrow.Table.from_arrays(arrays, names=[str(nm) for nm in columns])
+
+class ArrowExport(abc.ABC):
+    """Export through the Arrow PyCapsule (C Data) Interface
+
+    Subclasses implement `to_arrow()`, so that pyarrow, Polars, DuckDB etc. can
+    consume the data as Arrow arrays without converting it to Python lists.
+    """
+    @abc.abstractmethod
+    def to_arrow(self):
+        """Get the data as a pyarrow Table
+        """
+
+    def __arrow_c_stream__(self, requested_schema=None):
+        return self.to_arrow().__arrow_c_stream__(requested_schema)
+
+    def __arrow_c_array__(self, requested_schema=None):
+        import pyarrow
+        table = self.to_arrow()
+        batch = pyarrow.RecordBatch.from_arrays([col.combine_chunks() for col in table.columns],
+                                                names=table.column_names)
+        return batch.__arrow_c_array__(requested_schema)
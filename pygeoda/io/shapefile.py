@@ -0,0 +1,671 @@
+import os
+import hashlib
+import numpy as np
+
+__author__ = "Xun Li <lixun910@gmail.com>"
+
+# ESRI shape types that store a single (x, y) instead of a bounding box
+POINT_TYPES = (1, 11, 21)
+
+def _gather_ranges(buf, starts, lengths):
+    """Copy many byte ranges of a buffer into one contiguous array
+
+    Args:
+        buf (ndarray): A uint8 array (e.g. a numpy.memmap of a file)
+        starts (ndarray): The start offsets of the ranges
+        lengths (ndarray): The lengths of the ranges
+
+    Returns:
+        ndarray: A uint8 array with all ranges concatenated
+    """
+    lengths = np.asarray(lengths, dtype=np.int64)
+    starts = np.asarray(starts, dtype=np.int64)
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.uint8)
+    dest_starts = np.cumsum(lengths) - lengths
+    idx = np.arange(total, dtype=np.int64) + np.repeat(starts - dest_starts, lengths)
+    return np.asarray(buf[idx], dtype=np.uint8)
+
+def read_shx(shx_path):
+    """Read the record offsets from a .shx file
+
+    Args:
+        shx_path (str): The path of the .shx file
+
+    Returns:
+        tuple: The byte offsets of the records in .shp file and the byte lengths of the record contents
+    """
+    file_size = os.path.getsize(shx_path)
+    num_records = (file_size - 100) // 8
+    if num_records <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    index = np.memmap(shx_path, dtype='>i4', mode='r', offset=100, shape=(num_records, 2))
+    offsets = index[:, 0].astype(np.int64) * 2
+    content_lengths = index[:, 1].astype(np.int64) * 2
+    return offsets, content_lengths
+
+def read_shape_bounds(shp, offsets):
+    """Read the bounding box of every record without decoding the geometries
+
+    Args:
+        shp (ndarray): A uint8 numpy.memmap of the .shp file
+        offsets (ndarray): The byte offsets of the records (see read_shx())
+
+    Returns:
+        tuple: An int32 array of shape types and a (n, 4) float64 array of [minx, miny, maxx, maxy]
+            (NaN for null shapes)
+    """
+    n = len(offsets)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    # record header (8 bytes) + shape type (4 bytes)
+    shape_types = shp[(offsets + 8)[:, None] + np.arange(4)].copy().view('<i4').reshape(n)
+
+    bounds = np.full((n, 4), np.nan)
+    # a point record only has (x, y) after the shape type, other records start with the bbox
+    is_point = np.isin(shape_types, POINT_TYPES)
+    has_box = ~is_point & (shape_types != 0)
+    if is_point.any():
+        xy = shp[(offsets[is_point] + 12)[:, None] + np.arange(16)].copy().view('<f8').reshape(-1, 2)
+        bounds[is_point] = np.hstack([xy, xy])
+    if has_box.any():
+        box = shp[(offsets[has_box] + 12)[:, None] + np.arange(32)].copy().view('<f8').reshape(-1, 4)
+        bounds[has_box] = box
+    return shape_types, bounds
+
+class DbfField:
+    """
+    A field descriptor of a DBF file
+
+    Attributes:
+        name (str): The name of the field
+        type (str): The DBF type code (C, N, F, L, D)
+        length (int): The width of the field in bytes
+        decimals (int): The number of decimals
+        offset (int): The byte offset of the field in a record
+        descriptor (bytes): The raw 32-byte descriptor
+    """
+    def __init__(self, descriptor, offset):
+        self.name = descriptor[:11].split(b'\x00')[0].decode('latin-1').strip()
+        self.type = chr(descriptor[11])
+        self.length = descriptor[16]
+        self.decimals = descriptor[17]
+        self.offset = offset
+        self.descriptor = descriptor
+
+    def __repr__(self):
+        return "DbfField({0}, {1}, {2}, {3})".format(self.name, self.type, self.length, self.decimals)
+
+def read_dbf_header(dbf_path):
+    """Read the header of a DBF file
+
+    Args:
+        dbf_path (str): The path of the .dbf file
+
+    Returns:
+        tuple: The raw 32-byte file header, the number of records, the header length, the record length
+            and a list of DbfField
+    """
+    with open(dbf_path, 'rb') as f:
+        head = f.read(32)
+        num_records = int(np.frombuffer(head, dtype='<u4', count=1, offset=4)[0])
+        header_len, record_len = (int(v) for v in np.frombuffer(head, dtype='<u2', count=2, offset=8))
+        descriptors = f.read(header_len - 32)
+
+    fields = []
+    offset = 1 # deletion flag
+    for i in range(0, len(descriptors) - 31, 32):
+        if descriptors[i] == 0x0D:
+            break
+        field = DbfField(descriptors[i:i + 32], offset)
+        fields.append(field)
+        offset += field.length
+
+    return head, num_records, header_len, record_len, fields
+
+def dbf_encoding(dbf_path):
+    """Get the character encoding of a DBF file from its .cpg file (UTF-8 by default)
+    """
+    cpg_path = dbf_path[0:-3] + 'cpg'
+    if os.path.exists(cpg_path):
+        with open(cpg_path) as f:
+            encoding = f.read().strip()
+        if len(encoding) > 0:
+            return encoding
+    return 'utf-8'
+
+def decode_dbf_field(records, field, encoding='utf-8'):
+    """Decode one field of a DBF file for all records
+
+    Args:
+        records (ndarray): A (n, record_len) uint8 array of DBF records
+        field (DbfField): The field to decode
+        encoding (str): The character encoding of string fields
+
+    Returns:
+        ndarray: int64 (N without decimals and without nulls), float64 (N, F; nulls as NaN),
+            bool (L) or str (C, D and others) values
+    """
+    n = records.shape[0]
+    raw = np.ascontiguousarray(records[:, field.offset:field.offset + field.length])
+    raw = raw.view('S{0}'.format(field.length)).reshape(n)
+    raw = np.char.strip(raw)
+
+    if field.type in ('N', 'F'):
+        is_null = (raw == b'') | (np.char.strip(raw, b'*') == b'')
+        raw = np.where(is_null, b'nan', raw)
+        if field.type == 'N' and field.decimals == 0 and not is_null.any():
+            try:
+                return raw.astype(np.int64)
+            except ValueError:
+                pass
+        try:
+            return raw.astype(np.float64)
+        except ValueError:
+            return np.array([_to_float(v) for v in raw], dtype=np.float64)
+
+    if field.type == 'L':
+        return np.isin(raw, (b'T', b't', b'Y', b'y'))
+
+    return np.char.decode(raw, encoding, 'replace')
+
+def _to_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+class DbfColumns:
+    """
+    A read-only mapping from field names to decoded DBF columns. Columns are only
+    decoded when they are accessed.
+    """
+    def __init__(self, records, fields, encoding='utf-8'):
+        self._records = records
+        self._fields = dict((f.name, f) for f in fields)
+        self._encoding = encoding
+        self._decoded = {}
+
+    def __getitem__(self, name):
+        if name not in self._decoded:
+            if name not in self._fields:
+                raise KeyError(name)
+            self._decoded[name] = decode_dbf_field(self._records, self._fields[name], self._encoding)
+        return self._decoded[name]
+
+    def __contains__(self, name):
+        return name in self._fields
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def keys(self):
+        return self._fields.keys()
+
+def dbf_null_mask(records, field):
+    """Get the flags of undefined values of one field of a DBF file, as DBFIsAttributeNULL()
+    of shapelib (used by libgeoda) checks the value without the leading and trailing blanks:
+    an empty value, a N or F value starting with '*', a D value of "00000000" or a L value of '?'
+
+    Args:
+        records (ndarray): A (n, record_len) uint8 array of DBF records
+        field (DbfField): The field to check
+
+    Returns:
+        ndarray: A bool array, True if the value is undefined
+    """
+    raw = records[:, field.offset:field.offset + field.length]
+    n = raw.shape[0]
+    # the value ends at the first NUL byte
+    in_value = ~np.logical_or.accumulate(raw == 0, axis=1)
+    is_char = in_value & (raw != ord(' '))
+    is_empty = ~is_char.any(axis=1)
+    if raw.shape[1] == 0:
+        return is_empty
+
+    first = np.argmax(is_char, axis=1)
+    first_char = raw[np.arange(n), first]
+    if field.type in ('N', 'F'):
+        return is_empty | (first_char == ord('*'))
+    if field.type == 'L':
+        return ~is_empty & (first_char == ord('?'))
+    if field.type == 'D':
+        rows, cols = np.arange(n)[:, None], np.minimum(first[:, None] + np.arange(8), raw.shape[1] - 1)
+        is_zero = (raw[rows, cols] == ord('0')) & in_value[rows, cols]
+        return ~is_empty & (first + 8 <= raw.shape[1]) & is_zero.all(axis=1)
+    return is_empty
+
+def _sequential_sums(values, starts, counts):
+    """Sum the segments values[starts[i]:starts[i] + counts[i]] from left to right
+
+    The sums are rounded as a C loop that adds one value after another, which np.add.reduce
+    (pairwise summation) does not guarantee. The segments are grouped by the bit length of
+    their sizes and padded with zeros, so that every group is summed with one np.cumsum.
+    """
+    sums = np.zeros(len(counts))
+    groups = np.ceil(np.log2(np.maximum(counts, 1))).astype(np.int64)
+    for g in np.unique(groups):
+        rows = np.nonzero((groups == g) & (counts > 0))[0]
+        if len(rows) == 0:
+            continue
+        cols = np.arange(counts[rows].max())[:, None]
+        valid = cols < counts[rows]
+        block = np.where(valid, values[np.where(valid, starts[rows] + cols, 0)], 0.0)
+        sums[rows] = np.cumsum(block, axis=0)[-1]
+    return sums
+
+def _orientation_index(p1, p2, q):
+    """The orientation of q to the segment p1-p2 (1 left, -1 right, 0 collinear),
+    the filtered determinant of GEOS with an exact fallback
+    """
+    det_left = (p1[0] - q[0]) * (p2[1] - q[1])
+    det_right = (p1[1] - q[1]) * (p2[0] - q[0])
+    det = det_left - det_right
+    if det_left > 0.0 and det_right <= 0.0 or det_left < 0.0 and det_right >= 0.0 or det_left == 0.0:
+        return (det > 0) - (det < 0)
+
+    det_sum = abs(det_left) + abs(det_right)
+    if det >= 1e-15 * det_sum or -det >= 1e-15 * det_sum:
+        return (det > 0) - (det < 0)
+
+    from fractions import Fraction
+    dx1, dy1 = Fraction(p2[0]) - Fraction(p1[0]), Fraction(p2[1]) - Fraction(p1[1])
+    dx2, dy2 = Fraction(q[0]) - Fraction(p2[0]), Fraction(q[1]) - Fraction(p2[1])
+    det = dx1 * dy2 - dy1 * dx2
+    return (det > 0) - (det < 0)
+
+def _is_ccw(pts):
+    """Check if a closed ring is counter-clockwise, as the isCCW() of GEOS (and libgeoda)
+    """
+    n = len(pts) - 1
+    if n < 3:
+        return False
+
+    hi = int(np.argmax(pts[:, 1]))
+    prev = hi
+    while True:
+        prev = (n if prev == 0 else prev) - 1
+        if not (pts[prev] == pts[hi]).all() or prev == hi:
+            break
+    nxt = hi
+    while True:
+        nxt = (nxt + 1) % n
+        if not (pts[nxt] == pts[hi]).all() or nxt == hi:
+            break
+
+    p, h, q = pts[prev].tolist(), pts[hi].tolist(), pts[nxt].tolist()
+    if p == h or q == h or p == q:
+        return False
+    disc = _orientation_index(p, h, q)
+    return p[0] > q[0] if disc == 0 else disc > 0
+
+def _degenerate_centroid(rings):
+    """The centroid of a polygon without area: the length-weighted center of its
+    segments, or the mean of the first points of its rings
+    """
+    length, cx, cy, pts = 0.0, 0.0, 0.0, []
+    for ring in rings:
+        ring_len = 0.0
+        for (x0, y0), (x1, y1) in zip(ring[:-1].tolist(), ring[1:].tolist()):
+            seg_len = ((x0 - x1) * (x0 - x1) + (y0 - y1) * (y0 - y1)) ** 0.5
+            if seg_len == 0.0:
+                continue
+            ring_len += seg_len
+            cx += seg_len * ((x0 + x1) / 2)
+            cy += seg_len * ((y0 + y1) / 2)
+        length += ring_len
+        if ring_len == 0.0 and len(ring) > 0:
+            pts.append(ring[0])
+    if length > 0.0:
+        return cx / length, cy / length
+    if pts:
+        return tuple(np.sum(pts, axis=0) / len(pts))
+    return np.nan, np.nan
+
+def polygon_centroids(points, point_rec, point_part, num_obs):
+    """Compute the centroids of polygons as libgeoda does
+
+    libgeoda sums the triangles of every ring from the first point of the polygon, with the
+    sign of the ring orientation, so that the holes and the parts of a multi-polygon all
+    count with their (positive) area. The sums are rounded in the same order, so the
+    centroids are the same floating point values as the ones of libgeoda's weights.
+
+    Args:
+        points (ndarray): A (m, 2) float64 array of the points of all rings (closed)
+        point_rec (ndarray): The index of the record of every point, non-decreasing
+        point_part (ndarray): The global index of the ring of every point, non-decreasing
+        num_obs (int): The number of records
+
+    Returns:
+        ndarray: A (n, 2) float64 array of centroids (NaN for empty records)
+    """
+    centroids = np.full((num_obs, 2), np.nan)
+    if len(points) == 0:
+        return centroids
+
+    ring_starts = np.flatnonzero(np.r_[True, point_part[1:] != point_part[:-1]])
+    ring_ends = np.r_[ring_starts[1:], len(points)]
+    sign = np.array([-1.0 if _is_ccw(points[s:e]) else 1.0 for s, e in zip(ring_starts, ring_ends)])
+
+    # the triangles (base, p[i], p[i + 1]) of consecutive points of the same ring
+    rec_first = np.full(num_obs, -1, dtype=np.int64)
+    rec_first[point_rec[::-1]] = np.arange(len(points) - 1, -1, -1)
+    is_tri = point_part[:-1] == point_part[1:]
+    tri = np.flatnonzero(is_tri)
+    base = points[rec_first[point_rec[tri]]]
+    p1, p2 = points[tri], points[tri + 1]
+    area2 = (p1[:, 0] - base[:, 0]) * (p2[:, 1] - base[:, 1]) - (p2[:, 0] - base[:, 0]) * (p1[:, 1] - base[:, 1])
+    area2 = sign[np.searchsorted(ring_starts, tri, side='right') - 1] * area2
+    cx = area2 * (base[:, 0] + p1[:, 0] + p2[:, 0])
+    cy = area2 * (base[:, 1] + p1[:, 1] + p2[:, 1])
+
+    tri_rec = point_rec[tri]
+    counts = np.bincount(tri_rec, minlength=num_obs)
+    starts = np.cumsum(counts) - counts
+    area_sum = _sequential_sums(area2, starts, counts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        centroids[:, 0] = _sequential_sums(cx, starts, counts) / 3 / area_sum
+        centroids[:, 1] = _sequential_sums(cy, starts, counts) / 3 / area_sum
+
+    for rec in np.flatnonzero((area_sum == 0) & (rec_first >= 0)):
+        rings = [points[s:e] for s, e in zip(ring_starts, ring_ends) if point_rec[s] == rec]
+        centroids[rec] = _degenerate_centroid(rings)
+    return centroids
+
+class ShapefileReader:
+    """
+    A lazy reader of ESRI Shapefile
+
+    The .shp, .shx and .dbf files are memory-mapped. Geometries are located through
+    the .shx offsets and decoded on demand, and DBF fields are only decoded when
+    they are read, so the resident memory follows the data that is actually used.
+
+    Attributes:
+        ds_path (str): The path of the .shp file
+        num_obs (int): The number of records
+        shape_type (int): The ESRI shape type of the file
+        fields (list): A list of DbfField
+    """
+    def __init__(self, ds_path):
+        base_path = ds_path[0:-3]
+        self.ds_path = ds_path
+
+        self.offsets, self.content_lengths = read_shx(base_path + 'shx')
+        self.num_obs = len(self.offsets)
+
+        self.shp = np.memmap(ds_path, dtype=np.uint8, mode='r')
+        self.shape_type = int(self.shp[32:36].copy().view('<i4')[0])
+
+        head, num_records, header_len, record_len, fields = read_dbf_header(base_path + 'dbf')
+        if num_records != self.num_obs:
+            raise ValueError("The number of records in DBF file does not match the SHX file.")
+        self.dbf_head = head
+        self.fields = fields
+        self.encoding = dbf_encoding(base_path + 'dbf')
+        if num_records > 0:
+            self.records = np.memmap(base_path + 'dbf', dtype=np.uint8, mode='r', offset=header_len,
+                                     shape=(num_records, record_len))
+        else:
+            self.records = np.zeros((0, record_len), dtype=np.uint8)
+
+        self._field_map = dict((f.name, f) for f in fields)
+
+    def field(self, name):
+        """Get the DbfField of a field
+        """
+        if name not in self._field_map:
+            raise ValueError("The column name is not valid or not existed.")
+        return self._field_map[name]
+
+    def column(self, name):
+        """Decode the values of a field for all records (see decode_dbf_field())
+        """
+        return decode_dbf_field(self.records, self.field(name), self.encoding)
+
+    def null_mask(self, name):
+        """Get the flags of undefined values of a field
+        """
+        return dbf_null_mask(self.records, self.field(name))
+
+    def columns(self):
+        """Get a mapping of field names to lazily decoded columns
+        """
+        return DbfColumns(self.records, self.fields, self.encoding)
+
+    def record(self, idx):
+        """Decode the DBF record of one observation
+
+        Returns:
+            dict: field name -> value
+        """
+        row = self.records[idx:idx + 1]
+        return dict((f.name, decode_dbf_field(row, f, self.encoding)[0]) for f in self.fields)
+
+    def bounds(self):
+        """Get the shape types and bounding boxes of all records (see read_shape_bounds())
+        """
+        return read_shape_bounds(self.shp, self.offsets)
+
+    def shape(self, idx):
+        """Decode the geometry of one observation
+
+        Returns:
+            tuple: The start index of each part (ring) and a (n, 2) array of points.
+                A point record returns ([0], [[x, y]]), a null shape returns ([], empty array).
+        """
+        start = int(self.offsets[idx]) + 8
+        shape_type = int(self.shp[start:start + 4].copy().view('<i4')[0])
+        if shape_type == 0:
+            return np.zeros(0, dtype=np.int32), np.zeros((0, 2))
+        if shape_type in POINT_TYPES:
+            return np.zeros(1, dtype=np.int32), self.shp[start + 4:start + 20].copy().view('<f8').reshape(1, 2)
+
+        num_parts, num_points = (int(v) for v in self.shp[start + 36:start + 44].copy().view('<i4'))
+        parts_start = start + 44
+        points_start = parts_start + 4 * num_parts
+        parts = self.shp[parts_start:points_start].copy().view('<i4')
+        points = self.shp[points_start:points_start + 16 * num_points].copy().view('<f8').reshape(num_points, 2)
+        return parts, points
+
+    def points(self, rows=None):
+        """Decode the points of many records at once
+
+        Args:
+            rows (array, optional): The indexes of the records. Defaults to all records.
+
+        Returns:
+            tuple: A (n, 2) float64 array of points, an int64 array of the index of the record
+                of every point, and an int64 array of the index of the part (ring) of every point
+        """
+        offsets = self.offsets if rows is None else self.offsets[rows]
+        n = len(offsets)
+        starts = offsets + 8
+        shape_types = self.shp[starts[:, None] + np.arange(4)].copy().view('<i4').reshape(n)
+
+        is_point = np.isin(shape_types, POINT_TYPES)
+        if is_point.all():
+            points = self.shp[(starts + 4)[:, None] + np.arange(16)].copy().view('<f8').reshape(n, 2)
+            idx = np.arange(n, dtype=np.int64)
+            return points, idx, idx
+
+        has_parts = ~is_point & (shape_types != 0)
+        counts = np.zeros((n, 2), dtype=np.int64)
+        counts[has_parts] = self.shp[(starts[has_parts] + 36)[:, None] + np.arange(8)].copy().view('<i4').reshape(-1, 2)
+        num_parts, num_points = counts[:, 0], counts[:, 1]
+
+        parts = _gather_ranges(self.shp, starts + 44, 4 * num_parts).view('<i4').astype(np.int64)
+        points = _gather_ranges(self.shp, starts + 44 + 4 * num_parts, 16 * num_points).view('<f8').reshape(-1, 2)
+
+        point_rec = np.repeat(np.arange(n, dtype=np.int64), num_points)
+        # global start index of every part
+        point_base = np.cumsum(num_points) - num_points
+        part_starts = parts + np.repeat(point_base, num_parts)
+        point_part = np.zeros(len(points), dtype=np.int64)
+        if len(part_starts) > 0:
+            np.add.at(point_part, part_starts[1:], 1)
+            point_part = np.cumsum(point_part)
+        return points, point_rec, point_part
+
+    def centroids(self):
+        """Compute the centroids of all records
+        Points return their coordinates. Polygons return the centroids of libgeoda
+        (see polygon_centroids()). Lines return the mean of their points.
+
+        Returns:
+            ndarray: A (n, 2) float64 array of centroids (NaN for null shapes)
+        """
+        points, point_rec, point_part = self.points()
+        n = self.num_obs
+        if len(point_rec) == n and (point_rec == np.arange(n)).all() and (point_part == point_rec).all():
+            return points.copy()
+
+        if self.shape_type in (5, 15, 25):
+            return polygon_centroids(points, point_rec, point_part, n)
+
+        cnt = np.bincount(point_rec, minlength=n).astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_x = np.bincount(point_rec, weights=points[:, 0], minlength=n) / cnt
+            mean_y = np.bincount(point_rec, weights=points[:, 1], minlength=n) / cnt
+        return np.column_stack([mean_x, mean_y])
+
+def shapefile_fingerprint(ds_path, chunk_size=1 << 20):
+    """Get a content hash of the geometries (.shp file) of an ESRI shapefile
+
+    Args:
+        ds_path (str): The path of the .shp file
+
+    Returns:
+        str: A hex digest of the .shp file
+    """
+    h = hashlib.blake2b(digest_size=16)
+    with open(ds_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def subset_shapefile(ds_path, out_path, columns=None, bbox=None, where=None):
+    """Write a shapefile that only contains the selected fields and features
+
+    The records are copied byte by byte through the .shx offsets, so no geometry is decoded.
+    Only the fields used by `where` are decoded from the DBF file.
+
+    Args:
+        ds_path (str): The path of the input .shp file
+        out_path (str): The path of the output .shp file
+        columns (list, optional): The names of the fields to keep. Defaults to all fields.
+        bbox (tuple, optional): (minx, miny, maxx, maxy), keep the features whose bounding box intersects it
+        where (function or array, optional): A function that takes a mapping of field names to NumPy
+            arrays and returns a boolean array, or a boolean array, to select the features
+
+    Returns:
+        int: The number of features written
+    """
+    base_path = ds_path[0:-3]
+    out_base = out_path[0:-3]
+
+    reader = ShapefileReader(ds_path)
+    num_records = reader.num_obs
+
+    # feature selection
+    selected = np.ones(num_records, dtype=bool)
+    if bbox is not None:
+        if len(bbox) != 4:
+            raise ValueError("The bbox has to be a tuple of (minx, miny, maxx, maxy).")
+        minx, miny, maxx, maxy = bbox
+        _, bounds = reader.bounds()
+        with np.errstate(invalid='ignore'):
+            selected &= (bounds[:, 0] <= maxx) & (bounds[:, 2] >= minx) & \
+                        (bounds[:, 1] <= maxy) & (bounds[:, 3] >= miny)
+    if where is not None:
+        if callable(where):
+            where = where(reader.columns())
+        where = np.asarray(where, dtype=bool)
+        if where.shape != (num_records,):
+            raise ValueError("The where filter has to return one boolean value per feature.")
+        selected &= where
+
+    rows = np.flatnonzero(selected)
+    if len(rows) == 0:
+        raise ValueError("No features are selected from the shapefile.")
+
+    # field projection
+    if columns is None:
+        kept_fields = reader.fields
+    else:
+        missing = [c for c in columns if c not in reader._field_map]
+        if len(missing) > 0:
+            raise ValueError("The columns {0} are not existed in the shapefile.".format(missing))
+        kept_fields = [reader.field(c) for c in columns]
+
+    _write_shp_shx(reader.shp, reader.offsets[rows], reader.content_lengths[rows], out_path, out_base + 'shx')
+    _write_dbf(reader.dbf_head, reader.records, rows, kept_fields, out_base + 'dbf')
+
+    for ext in ('prj', 'cpg'):
+        if os.path.exists(base_path + ext):
+            with open(base_path + ext, 'rb') as src, open(out_base + ext, 'wb') as dst:
+                dst.write(src.read())
+
+    return len(rows)
+
+def _write_shp_shx(shp, offsets, content_lengths, shp_path, shx_path):
+    n = len(offsets)
+    header = np.array(shp[:100], dtype=np.uint8)
+    record_lengths = content_lengths + 8
+
+    body = _gather_ranges(shp, offsets, record_lengths)
+    new_offsets = np.cumsum(record_lengths) - record_lengths
+    # renumber records from 1 to n
+    rec_nums = np.arange(1, n + 1, dtype='>i4').view(np.uint8).reshape(n, 4)
+    body[new_offsets[:, None] + np.arange(4)] = rec_nums
+
+    _, bounds = read_shape_bounds(body, new_offsets)
+    header[24:28] = np.frombuffer(np.array([(100 + len(body)) // 2], dtype='>i4').tobytes(), dtype=np.uint8)
+    if not np.isnan(bounds).all():
+        box = [np.nanmin(bounds[:, 0]), np.nanmin(bounds[:, 1]), np.nanmax(bounds[:, 2]), np.nanmax(bounds[:, 3])]
+        header[36:68] = np.frombuffer(np.array(box, dtype='<f8').tobytes(), dtype=np.uint8)
+
+    with open(shp_path, 'wb') as f:
+        f.write(header.tobytes())
+        f.write(body.tobytes())
+
+    shx_header = header.copy()
+    shx_header[24:28] = np.frombuffer(np.array([(100 + 8 * n) // 2], dtype='>i4').tobytes(), dtype=np.uint8)
+    index = np.empty((n, 2), dtype='>i4')
+    index[:, 0] = (new_offsets + 100) // 2
+    index[:, 1] = content_lengths // 2
+
+    with open(shx_path, 'wb') as f:
+        f.write(shx_header.tobytes())
+        f.write(index.tobytes())
+
+def _write_dbf(head, records, rows, fields, dbf_path):
+    n = len(rows)
+    header_len = 32 + 32 * len(fields) + 1
+    record_len = 1 + sum(f.length for f in fields)
+
+    header = np.frombuffer(head, dtype=np.uint8).copy()
+    header[4:8] = np.frombuffer(np.array([n], dtype='<u4').tobytes(), dtype=np.uint8)
+    header[8:12] = np.frombuffer(np.array([header_len, record_len], dtype='<u2').tobytes(), dtype=np.uint8)
+
+    descriptors = bytearray()
+    cols = [np.zeros(1, dtype=np.int64)] # deletion flag
+    offset = 1
+    for f in fields:
+        desc = bytearray(f.descriptor)
+        desc[12:16] = np.array([offset], dtype='<u4').tobytes()
+        descriptors += desc
+        cols.append(np.arange(f.offset, f.offset + f.length, dtype=np.int64))
+        offset += f.length
+
+    body = records[np.ix_(rows, np.concatenate(cols))]
+
+    with open(dbf_path, 'wb') as f:
+        f.write(header.tobytes())
+        f.write(bytes(descriptors))
+        f.write(b'\x0d')
+        f.write(np.ascontiguousarray(body).tobytes())
+        f.write(b'\x1a')
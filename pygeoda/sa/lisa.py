@@ -1,9 +1,11 @@
 from ..libgeoda import LISA, BatchLISA
+from ..io import arrow_table, ArrowExport
 import math
+import numpy as np
 
 __author__ = "Xun Li <lixun910@gmail.com>, Yeqing Han <yeqinghan_geo@163.com>"
 
-class lisa:
+class lisa(ArrowExport):
     """A LISA class wrappers the results of LISA computation
   
     Attributes:
@@ -104,6 +106,23 @@ class lisa:
         """
         return self.gda_lisa.GetColors()
 
+    def to_arrow(self):
+        """Get the LISA results as a pyarrow Table
+        The lisa object can also be passed directly to pyarrow, Polars or DuckDB,
+        which read it through the Arrow C Data Interface (`__arrow_c_stream__`).
+
+        Return:
+            :obj:`pyarrow.Table`: a table with the columns lisa_values, lisa_pvalues,
+                lisa_clusters and lisa_num_nbrs
+        """
+        pvals = np.asarray(self.gda_lisa.GetLocalSignificanceValues(), dtype=np.float64)
+        return arrow_table({
+            "lisa_values": np.asarray(self.gda_lisa.GetLISAValues(), dtype=np.float64),
+            "lisa_pvalues": np.where(pvals < 0, np.nan, pvals),
+            "lisa_clusters": np.asarray(self.gda_lisa.GetClusterIndicators(), dtype=np.int32),
+            "lisa_num_nbrs": np.asarray(self.gda_lisa.GetNumNeighbors(), dtype=np.int32),
+        })
+
     def lisa_fdr(self, p):
         '''False Discovery Rate value of local spatial autocorrelation
         Get False Discovery Rate value based on current LISA computation and current significant p-value
@@ -3,6 +3,8 @@ A module for spatial weights
 """
 from .queen import queen_weights
 from .rook import rook_weights
-from .distance import distance_weights, min_distthreshold, knn_weights
+from .distance import distance_weights, distance_neighbor_counts, min_distthreshold, knn_weights, knn_weights_multi
 from .kernel import kernel_weights, kernel_knn_weights
-from .weight import Weight, read_gal, read_gwt, read_swm
\ No newline at end of file
+from .weight import Weight, read_gal, read_gwt, read_swm
+from .gwb import read_gwb
+from .cache import WeightsCache, set_weights_cache, get_weights_cache
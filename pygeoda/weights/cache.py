@@ -0,0 +1,160 @@
+import os
+import json
+import hashlib
+import tempfile
+
+from .gwb import read_gwb, write_gwb
+
+__author__ = "Xun Li <lixun910@gmail.com>"
+
+_weights_cache = None
+
+class WeightsCache:
+    """
+    An on-disk cache of spatial weights
+
+    The weights are stored as binary .gwb files, one file per weights, keyed by the
+    fingerprint of the geometries and the parameters of the weights builder.
+    The least recently used files are removed when the total size exceeds max_bytes.
+
+    Attributes:
+        cache_dir (str): The directory of the cached weights files
+        max_bytes (int): The maximum total size of the cached weights files
+    """
+    ext = ".gwb"
+
+    def __init__(self, cache_dir, max_bytes=1 << 30):
+        if max_bytes < 0:
+            raise ValueError("The size of weights cache has to be a non-negative integer.")
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, fingerprint, builder, params):
+        """Get the cache key of the weights built by builder(**params) for a dataset
+        """
+        desc = json.dumps([fingerprint, builder, params], sort_keys=True, default=str)
+        return hashlib.blake2b(desc.encode('utf-8'), digest_size=16).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + self.ext)
+
+    def get(self, key):
+        """Get the cached weights, or None if the key is not in the cache
+        """
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            w = self._read(path)
+        except (OSError, ValueError, KeyError):
+            return None
+        # mark as recently used
+        os.utime(path, None)
+        return w
+
+    def put(self, key, w):
+        """Store the weights in the cache and evict the least recently used weights if needed
+        """
+        if self.max_bytes <= 0:
+            return
+        fd, tmp_path = tempfile.mkstemp(suffix=self.ext, dir=self.cache_dir)
+        os.close(fd)
+        try:
+            write_gwb(w, tmp_path)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._evict()
+
+    def _read(self, path):
+        return read_gwb(path)
+
+    def _entries(self):
+        entries = []
+        for nm in os.listdir(self.cache_dir):
+            if nm.endswith(self.ext):
+                path = os.path.join(self.cache_dir, nm)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def nbytes(self):
+        """Get the total size of the cached weights files
+        """
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Remove all cached weights files
+        """
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def set_weights_cache(cache_dir, max_bytes=1 << 30):
+    """Enable (or disable) the on-disk spatial weights cache
+    When enabled, the weights functions, e.g. queen_weights() or knn_weights(), load the weights
+    from the cache if the same weights have been created for the same geometries before.
+
+    Args:
+        cache_dir (str): The directory of the cached weights files. None disables the cache.
+        max_bytes (int, optional): The maximum total size of the cached weights files, the least
+            recently used weights are removed first. Defaults to 1 GB.
+
+    Returns:
+        WeightsCache: The weights cache, or None if the cache is disabled
+    """
+    global _weights_cache
+    _weights_cache = None if cache_dir is None else WeightsCache(cache_dir, max_bytes)
+    return _weights_cache
+
+def get_weights_cache():
+    """Get the on-disk spatial weights cache
+
+    Returns:
+        WeightsCache: The weights cache, or None if the cache is disabled
+    """
+    return _weights_cache
+
+def cached_weights(geoda_obj, builder, params, build):
+    """Load the weights from the weights cache, or create them with build() and store them
+
+    Args:
+        geoda_obj (geoda): An instance of geoda class
+        builder (str): The name of the weights function
+        params (dict): The parameters of the weights function
+        build (function): A function that creates the Weight object
+
+    Returns:
+        Weight: An instance of Weight class
+    """
+    cache = _weights_cache
+    fingerprint = geoda_obj.fingerprint() if cache is not None and hasattr(geoda_obj, 'fingerprint') else None
+    if fingerprint is None:
+        return build()
+
+    key = cache.key(fingerprint, builder, params)
+    w = cache.get(key)
+    if w is None:
+        w = build()
+        cache.put(key, w)
+    return w
@@ -0,0 +1,232 @@
+import numpy as np
+
+from .parallel import map_chunks
+from .weight import Weight, _sorted_member
+
+__author__ = "Xun Li <lixun910@gmail.com>"
+
+def _coord_keys(coords):
+    """Get the coordinates as a contiguous float64 array, with -0.0 normalized to 0.0
+    """
+    return np.ascontiguousarray(coords, dtype=np.float64) + 0.0
+
+def _hash_buckets(keys, num_buckets):
+    """Assign rows of coordinates to buckets by a hash of their bits, so that equal rows share a bucket
+    """
+    if num_buckets <= 1:
+        return np.zeros(len(keys), dtype=np.int64)
+    bits = keys.view(np.uint64)
+    h = np.zeros(len(keys), dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for j in range(bits.shape[1]):
+            h = (h ^ bits[:, j]) * np.uint64(0x9E3779B97F4A7C15)
+    return ((h >> np.uint64(32)) % np.uint64(num_buckets)).astype(np.int64)
+
+def _shared_key_pairs(keys, polys):
+    """Get all (poly, poly) pairs of different polygons that share a key (vertex or edge)
+
+    Args:
+        keys (ndarray): A (m, d) float64 array, one row per vertex or edge
+        polys (ndarray): The polygon index of every row
+
+    Returns:
+        tuple: The int64 arrays of rows and cols of the pairs
+    """
+    if len(keys) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # sort by key, then by polygon
+    order = np.lexsort((polys,) + tuple(keys[:, j] for j in range(keys.shape[1] - 1, -1, -1)))
+    keys, polys = keys[order], polys[order]
+
+    new_key = np.ones(len(keys), dtype=bool)
+    new_key[1:] = np.any(keys[1:] != keys[:-1], axis=1)
+    # drop the repeated (key, polygon) rows, e.g. the closing vertex of a ring
+    keep = new_key.copy()
+    keep[1:] |= polys[1:] != polys[:-1]
+    polys, new_key = polys[keep], new_key[keep]
+
+    sizes = np.diff(np.append(np.flatnonzero(new_key), len(polys)))
+    shared = np.repeat(sizes > 1, sizes)
+    polys, new_key = polys[shared], new_key[shared]
+    if len(polys) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # every polygon of a group is paired with every polygon of the group
+    starts = np.flatnonzero(new_key)
+    sizes = np.diff(np.append(starts, len(polys)))
+    elem_size = np.repeat(sizes, sizes)
+    elem_start = np.repeat(starts, sizes)
+
+    rows = np.repeat(polys, elem_size)
+    offs = np.arange(len(rows)) - np.repeat(np.cumsum(elem_size) - elem_size, elem_size)
+    cols = polys[np.repeat(elem_start, elem_size) + offs]
+    mask = rows != cols
+    return rows[mask], cols[mask]
+
+def contiguity_weights(num_obs, points, point_poly, point_ring, rook=False, cpu_threads=1):
+    """Create first order contiguity weights from the vertices of polygons
+
+    Polygons are queen neighbors if they share a vertex, and rook neighbors if they
+    share an edge (two consecutive vertices of a ring). The vertices (or edges) are
+    partitioned by a hash of their coordinates, the partitions are processed in
+    parallel, and the neighbors are merged and sorted, so the result does not
+    depend on the number of threads.
+
+    Args:
+        num_obs (int): The number of polygons
+        points (ndarray): A (m, 2) array of the vertices of all rings
+        point_poly (ndarray): The index of the polygon of every vertex
+        point_ring (ndarray): The index of the ring of every vertex
+        rook (bool): A bool flag indicates if rook (shared edge) or queen (shared vertex) contiguity
+        cpu_threads (int): The number of cpu threads
+
+    Returns:
+        Weight: An instance of Weight class
+    """
+    pts = _coord_keys(points)
+    point_poly = np.asarray(point_poly, dtype=np.int64)
+    point_ring = np.asarray(point_ring)
+
+    if rook:
+        same_ring = point_ring[1:] == point_ring[:-1]
+        a, b = pts[:-1][same_ring], pts[1:][same_ring]
+        # an edge is undirected: order its two end points
+        swap = (a[:, 0] > b[:, 0]) | ((a[:, 0] == b[:, 0]) & (a[:, 1] > b[:, 1]))
+        keys = np.hstack([np.where(swap[:, None], b, a), np.where(swap[:, None], a, b)])
+        polys = point_poly[:-1][same_ring]
+        valid = np.any(keys[:, :2] != keys[:, 2:], axis=1)
+    else:
+        keys, polys = pts, point_poly
+        valid = np.ones(len(keys), dtype=bool)
+    valid &= ~np.isnan(keys).any(axis=1)
+    keys, polys = keys[valid], polys[valid]
+
+    num_buckets = max(1, int(cpu_threads))
+    buckets = _hash_buckets(keys, num_buckets)
+    order = np.argsort(buckets, kind='stable')
+    bounds = np.searchsorted(buckets[order], np.arange(num_buckets + 1))
+
+    def run(start, end):
+        sel = order[bounds[start]:bounds[end]]
+        return _shared_key_pairs(keys[sel], polys[sel])
+
+    pairs = map_chunks(run, num_buckets, num_buckets, min_chunk=1)
+    rows = np.concatenate([r for r, _ in pairs]) if pairs else np.zeros(0, dtype=np.int64)
+    cols = np.concatenate([c for _, c in pairs]) if pairs else np.zeros(0, dtype=np.int64)
+
+    edges = np.unique(rows * num_obs + cols)
+    rows, cols = edges // num_obs, edges % num_obs
+    indptr = np.zeros(num_obs + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_obs), out=indptr[1:])
+    return Weight.from_csr(indptr, cols)
+
+def higher_order_weights(w, order, include_lower_order=False, cpu_threads=1):
+    """Create higher order contiguity weights from first order contiguity weights
+
+    The neighbors of order k of an observation are the observations whose shortest path
+    to it in the first order weights has exactly k steps. They are found by a breadth-first
+    search bounded at order steps, run for all observations of a chunk at once as (source, node)
+    arrays, and the chunks are searched in parallel.
+
+    Args:
+        w (Weight): The first order contiguity weights
+        order (int): An integer value of order of contiguity
+        include_lower_order (bool): A bool flag indicates whether or not the lower order neighbors should be
+            included in the weights structure
+        cpu_threads (int): The number of cpu threads
+
+    Returns:
+        Weight: An instance of Weight class
+    """
+    if order < 1:
+        raise ValueError("The order of contiguity has to be a positive integer number.")
+
+    num_obs = w.num_obs
+    indptr, indices, _ = w.to_csr()
+    indptr, indices = indptr.astype(np.int64), indices.astype(np.int64)
+    counts = np.diff(indptr)
+
+    def run(start, end):
+        src = np.arange(start, end, dtype=np.int64)
+        visited = src * num_obs + src
+        frontier_src, frontier_node = src, src
+        found = []
+        for level in range(1, order + 1):
+            cnt = counts[frontier_node]
+            offs = np.arange(cnt.sum()) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+            nbrs = indices[np.repeat(indptr[frontier_node], cnt) + offs]
+            keys = np.sort(np.repeat(frontier_src, cnt) * num_obs + nbrs)
+            keys = keys[np.append(True, keys[1:] != keys[:-1])] if len(keys) else keys
+            keys = keys[~_sorted_member(keys, visited)]
+            if level == order or include_lower_order:
+                found.append(keys)
+            if len(keys) == 0:
+                break
+            # the new keys are not visited yet, so a sort merges them
+            visited = np.sort(np.concatenate([visited, keys]))
+            frontier_src, frontier_node = keys // num_obs, keys % num_obs
+        return np.sort(np.concatenate(found)) if found else np.zeros(0, dtype=np.int64)
+
+    edges = np.concatenate(map_chunks(run, num_obs, cpu_threads, min_chunk=1000))
+    rows, cols = edges // num_obs, edges % num_obs
+    indptr = np.zeros(num_obs + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_obs), out=indptr[1:])
+    return Weight.from_csr(indptr, cols)
+
+def first_order_contiguity(geoda_obj, gda_builder, rook, precision_threshold, cpu_threads):
+    """Get the first order contiguity weights of geoda_obj, kept in memory for the higher orders
+
+    Args:
+        geoda_obj (geoda): An instance of geoda class
+        gda_builder (function): The libgeoda weights function, gda_queen_weights or gda_rook_weights
+        rook (bool): A bool flag indicates if rook or queen contiguity
+        precision_threshold (float): The precision threshold of the coordinates
+        cpu_threads (int): The number of cpu threads, None to use the libgeoda builder
+
+    Returns:
+        Weight: An instance of Weight class
+    """
+    cache = getattr(geoda_obj, '_contiguity', {})
+    key = (bool(rook), precision_threshold, cpu_threads is not None)
+    if key not in cache:
+        vertices = None
+        if cpu_threads is not None and precision_threshold == 0 and hasattr(geoda_obj, '_vertices'):
+            vertices = geoda_obj._vertices()
+        if vertices is None:
+            cache[key] = Weight(gda_builder(geoda_obj.gda, 1, False, precision_threshold))
+        else:
+            cache[key] = contiguity_weights(geoda_obj.num_obs, *vertices, rook=rook, cpu_threads=cpu_threads)
+    return cache[key]
+
+def contiguity_order_weights(geoda_obj, gda_builder, rook, order, include_lower_order, precision_threshold,
+                             cpu_threads):
+    """Get the contiguity weights of an order, derived from the first order contiguity where it is faster
+
+    A single higher order call is left to the libgeoda builder, which is faster than building the first order
+    weights and expanding them. The first order weights are expanded when they are already kept in memory
+    from an earlier call on the same geoda object, or when cpu_threads is given.
+
+    Args:
+        geoda_obj (geoda): An instance of geoda class
+        gda_builder (function): The libgeoda weights function, gda_queen_weights or gda_rook_weights
+        rook (bool): A bool flag indicates if rook or queen contiguity
+        order (int): An integer value of order of contiguity
+        include_lower_order (bool): A bool flag indicates whether or not the lower order neighbors should be
+            included in the weights structure
+        precision_threshold (float): The precision threshold of the coordinates
+        cpu_threads (int): The number of cpu threads, None to use the libgeoda builder
+
+    Returns:
+        Weight: An instance of Weight class
+    """
+    if order == 1 or cpu_threads is not None:
+        w = first_order_contiguity(geoda_obj, gda_builder, rook, precision_threshold, cpu_threads)
+        return w if order == 1 else higher_order_weights(w, order, include_lower_order, cpu_threads)
+
+    cache = getattr(geoda_obj, '_contiguity', {})
+    for multi_threaded in (False, True):
+        key = (bool(rook), precision_threshold, multi_threaded)
+        if key in cache:
+            return higher_order_weights(cache[key], order, include_lower_order)
+    return Weight(gda_builder(geoda_obj.gda, order, include_lower_order, precision_threshold))
@@ -1,7 +1,19 @@
 __author__ = "Xun Li <lixun910@gmail.com>"
 
-from ..libgeoda import gda_distance_weights, gda_min_distthreshold, gda_knn_weights
-from .weight import Weight
+from ..libgeoda import gda_distance_weights, gda_min_distthreshold, gda_knn_weights, gda_knn_weights_sub
+from .weight import Weight, _weights_to_csr
+from .parallel import map_chunks, chunk_ranges
+import numpy as np
+from .cache import cached_weights
+from .spatial_index import index_knn_csr, index_radius_csr, index_radius_counts
+
+def _weights_index(geoda_obj, use_index, is_inverse, is_arc, is_mile):
+    '''Get the shared spatial index of geoda_obj for a weights builder, or None to use libgeoda
+    The index creates binary weights only; the inverse distance weights are created by libgeoda.
+    '''
+    if not use_index or is_inverse or not hasattr(geoda_obj, 'spatial_index'):
+        return None
+    return geoda_obj.spatial_index(is_arc, is_mile)
 
 def distance_weights(geoda_obj, dist_thres, **kwargs):
     '''Distance-based Spatial Weights
@@ -17,6 +29,12 @@ def distance_weights(geoda_obj, dist_thres, **kwargs):
             Defaults to False.
         is_arc (bool, optional): A bool flag indicates if compute arc distance or Euclidean distance. Defaults to False (Euclidean distance) 
         is_mile (bool, optional): A bool flag indicates if the distance unit is mile or km. Defaults to True (mile).
+        use_index (bool, optional): A bool flag indicates if the neighbors are searched in the spatial index
+            shared by the weights of this dataset (see geoda.spatial_index()). Defaults to False (libgeoda).
+        cpu_threads (int, optional): The number of cpu threads used to search the spatial index. Defaults to 1.
+        max_edges (int, optional): The maximum number of neighbor pairs. If set, the neighbors are counted
+            first (see distance_neighbor_counts()) and a ValueError is raised if there are more. The check is
+            skipped if the centroids of the geometries are unknown. Defaults to None.
 
     Returns:
         Weight: An instance of Weight class 
@@ -25,16 +43,60 @@ def distance_weights(geoda_obj, dist_thres, **kwargs):
     is_inverse = False if 'is_inverse' not in kwargs else kwargs['is_inverse']
     is_arc = False if 'is_arc' not in kwargs else kwargs['is_arc']
     is_mile = True if 'is_mile' not in kwargs else kwargs['is_mile']
+    use_index = False if 'use_index' not in kwargs else kwargs['use_index']
+    cpu_threads = 1 if 'cpu_threads' not in kwargs else kwargs['cpu_threads']
+    max_edges = None if 'max_edges' not in kwargs else kwargs['max_edges']
+
+    # the index uses the centroids and the distance of libgeoda, so it counts the pairs libgeoda creates
+    count_index = None if max_edges is None else _weights_index(geoda_obj, True, False, is_arc, is_mile)
+    if count_index is not None:
+        num_edges = int(index_radius_counts(count_index, dist_thres, cpu_threads).sum())
+        if num_edges > max_edges:
+            raise ValueError("The distance threshold creates {0} neighbor pairs, more than max_edges={1}."
+                             .format(num_edges, max_edges))
 
     poly_id = ""
     kernel = ""
     diagonal = False
-    gda_w = gda_distance_weights(geoda_obj.gda, dist_thres, poly_id, power, is_inverse, is_arc, is_mile, kernel, diagonal)
+    params = {'dist_thres': dist_thres, 'power': power, 'is_inverse': is_inverse, 'is_arc': is_arc, 'is_mile': is_mile}
+    if use_index:
+        params['use_index'] = True
+
+    def build():
+        index = _weights_index(geoda_obj, use_index, is_inverse, is_arc, is_mile)
+        if index is not None:
+            return Weight.from_csr(*index_radius_csr(index, dist_thres, cpu_threads))
+        return Weight(gda_distance_weights(geoda_obj.gda, dist_thres, poly_id, power, is_inverse, is_arc, is_mile, kernel, diagonal))
 
-    return Weight(gda_w)
+    return cached_weights(geoda_obj, 'distance_weights', params, build)
 
 
-def min_distthreshold(geoda_obj, is_arc=False, is_mile=True):
+def distance_neighbor_counts(geoda_obj, dist_thres, **kwargs):
+    '''Neighbor Counts of Distance-based Spatial Weights
+    Count the neighbors of every observation within a distance threshold, without creating the weights.
+    It is a cheap check of a threshold before distance_weights(): the sum is the number of neighbor
+    pairs of the weights, and numpy.bincount() of the counts is the histogram of the number of neighbors.
+
+    Args:
+        geoda_obj (geoda): An instance of geoda class. 
+        dist_thres (float): A positive numeric value of distance threshold used to find neighbors.
+        is_arc (bool, optional): A bool flag indicates if compute arc distance or Euclidean distance. Defaults to False (Euclidean distance) 
+        is_mile (bool, optional): A bool flag indicates if the distance unit is mile or km. Defaults to True (mile).
+        cpu_threads (int, optional): The number of cpu threads. Defaults to 1.
+
+    Returns:
+        ndarray: The int64 numbers of neighbors of all observations
+    '''
+    is_arc = False if 'is_arc' not in kwargs else kwargs['is_arc']
+    is_mile = True if 'is_mile' not in kwargs else kwargs['is_mile']
+    cpu_threads = 1 if 'cpu_threads' not in kwargs else kwargs['cpu_threads']
+
+    index = _weights_index(geoda_obj, True, False, is_arc, is_mile)
+    if index is None:
+        raise ValueError("The neighbors can't be counted without the centroids of the geometries.")
+    return index_radius_counts(index, dist_thres, cpu_threads)
+
+def min_distthreshold(geoda_obj, is_arc=False, is_mile=True, use_index=False, cpu_threads=1):
     '''Minimum Distance Threshold for Distance-based Weights
     Get minimum threshold of distance that makes sure each observation has at least one neighbor   
 
@@ -42,11 +104,24 @@ def min_distthreshold(geoda_obj, is_arc=False, is_mile=True):
         geoda_obj (geoda): An instance of geoda class. 
         is_arc (bool, optional): A bool flag indicates if compute arc distance or Euclidean distance. Defaults to False (Euclidean distance) 
         is_mile (bool, optional): A bool flag indicates if the distance unit is mile or km. Defaults to True (mile).
+        use_index (bool, optional): A bool flag indicates if the nearest neighbors are searched in the spatial index
+            shared by the weights of this dataset (see geoda.spatial_index()); the threshold is the same
+            as the one of libgeoda. Defaults to False (libgeoda).
+        cpu_threads (int, optional): The number of cpu threads used to search the spatial index. Defaults to 1.
 
     Returns:
         thres (float): A float value of minimum threhold for distance based weights.
     '''
-    return gda_min_distthreshold(geoda_obj.gda, is_arc, is_mile)
+    index = _weights_index(geoda_obj, use_index, False, is_arc, is_mile)
+    if index is not None:
+        # the nearest neighbor distances are kept in the index for later calls
+        return float(index.nn_distances(cpu_threads).max())
+
+    cache = getattr(geoda_obj, '_min_distthreshold', {})
+    key = (bool(is_arc), bool(is_mile))
+    if key not in cache:
+        cache[key] = gda_min_distthreshold(geoda_obj.gda, is_arc, is_mile)
+    return cache[key]
 
 def knn_weights(geoda_obj, k, **kwargs):
     '''K-Nearest Neighbors-based Spatial Weights
@@ -60,7 +135,10 @@ def knn_weights(geoda_obj, k, **kwargs):
             Defaults to False.
         is_arc (bool, optional): A bool flag indicates if compute arc distance or Euclidean distance. Defaults to False (Euclidean distance) 
         is_mile (bool, optional): A bool flag indicates if the distance unit is mile or km. Defaults to True (mile).
-
+        cpu_threads (int, optional): The number of cpu threads. The observations are split into chunks
+            whose neighbors are searched in parallel. Defaults to None (single-threaded).
+        use_index (bool, optional): A bool flag indicates if the neighbors are searched in the spatial index
+            shared by the weights of this dataset (see geoda.spatial_index()). Defaults to False (libgeoda).
 
     Returns:
         Weight: An instance of Weight class 
@@ -69,7 +147,9 @@ def knn_weights(geoda_obj, k, **kwargs):
     is_inverse = False if 'is_inverse' not in kwargs else kwargs['is_inverse']
     is_arc = False if 'is_arc' not in kwargs else kwargs['is_arc']
     is_mile = True if 'is_mile' not in kwargs else kwargs['is_mile']
-    
+    cpu_threads = None if 'cpu_threads' not in kwargs else kwargs['cpu_threads']
+    use_index = False if 'use_index' not in kwargs else kwargs['use_index']
+
     # not used
     kernel = "" 
     bandwidth = 0 
@@ -77,6 +157,104 @@ def knn_weights(geoda_obj, k, **kwargs):
     use_kernel_diagnals = False 
     polyid = ""
 
-    gda_w = gda_knn_weights(geoda_obj.gda, k, power, is_inverse, is_arc, is_mile, kernel, bandwidth, adaptive_bandwidth, use_kernel_diagnals, polyid)
+    params = {'k': k, 'power': power, 'is_inverse': is_inverse, 'is_arc': is_arc, 'is_mile': is_mile}
+    if use_index:
+        params['use_index'] = True
+
+    def build():
+        index = _weights_index(geoda_obj, use_index, is_inverse, is_arc, is_mile)
+        if index is not None:
+            return Weight.from_csr(*index_knn_csr(index, k, 1 if cpu_threads is None else cpu_threads)[:2])
+        return knn_weights_threaded(geoda_obj, k, cpu_threads, power, is_inverse, is_arc, is_mile, kernel, bandwidth,
+                                    adaptive_bandwidth, use_kernel_diagnals, polyid)
+
+    return cached_weights(geoda_obj, 'knn_weights', params, build)
+
+def knn_weights_multi(geoda_obj, ks, **kwargs):
+    '''K-Nearest Neighbors-based Spatial Weights for Multiple k
+    Create the k-nearest neighbors based spatial weights for a list of k. The neighbors are
+    searched once for the largest k in the spatial index of geoda_obj (see geoda.spatial_index()),
+    and the weights of a smaller k take the nearest k of the sorted neighbors.
+
+    Args:
+        geoda_obj (geoda): An instance of geoda class. 
+        ks (list): A list of positive integer numbers for k-nearest neighbors
+        power (float, optional): The power (or exponent) of a number indicates how many times to use the number in a multiplication.
+        is_inverse (bool, optional):  A bool flag indicates whether or not to apply inverse on distance value.
+            Defaults to False.
+        is_arc (bool, optional): A bool flag indicates if compute arc distance or Euclidean distance. Defaults to False (Euclidean distance) 
+        is_mile (bool, optional): A bool flag indicates if the distance unit is mile or km. Defaults to True (mile).
+        cpu_threads (int, optional): The number of cpu threads used to search the spatial index. Defaults to 1.
+
+    Returns:
+        list: A list of Weight objects, one per k
+    '''
+    ks = list(ks)
+    if len(ks) == 0 or any(int(k) != k or k < 1 for k in ks):
+        raise ValueError("The ks has to be a non-empty list of positive integer numbers.")
+
+    power = 1.0 if 'power' not in kwargs else kwargs['power']
+    is_inverse = False if 'is_inverse' not in kwargs else kwargs['is_inverse']
+    is_arc = False if 'is_arc' not in kwargs else kwargs['is_arc']
+    is_mile = True if 'is_mile' not in kwargs else kwargs['is_mile']
+    cpu_threads = 1 if 'cpu_threads' not in kwargs else kwargs['cpu_threads']
+
+    index = _weights_index(geoda_obj, True, is_inverse, is_arc, is_mile)
+    if index is None:
+        # no shared index, e.g. inverse distance weights: one libgeoda search per k
+        return [knn_weights(geoda_obj, int(k), **kwargs) for k in ks]
+
+    max_k = int(max(ks))
+    search = {}
+
+    def build(k):
+        # the search runs only if a weights is not in the weights cache
+        if 'nbrs' not in search:
+            _, nbrs, _ = index_knn_csr(index, max_k, cpu_threads)
+            search['nbrs'] = nbrs.reshape(index.num_obs, max_k)
+        indptr = np.arange(0, index.num_obs * k + 1, k, dtype=np.int64)
+        return Weight.from_csr(indptr, search['nbrs'][:, :k].ravel())
+
+    weights = []
+    for k in ks:
+        params = {'k': int(k), 'power': power, 'is_inverse': is_inverse, 'is_arc': is_arc, 'is_mile': is_mile,
+                  'use_index': True}
+        weights.append(cached_weights(geoda_obj, 'knn_weights', params, lambda: build(int(k))))
+    return weights
+
+def knn_weights_threaded(geoda_obj, k, cpu_threads, power, is_inverse, is_arc, is_mile, kernel, bandwidth,
+                         adaptive_bandwidth, use_kernel_diagonals, polyid):
+    '''Create k-nearest neighbors based weights in parallel
+    The observations are split into chunks, the neighbors of every chunk are searched with
+    gda_knn_weights_sub() in a thread pool (libgeoda releases the GIL), and the rows are concatenated.
+    With cpu_threads None, a single chunk or a kernel, gda_knn_weights() is used: the kernel weights
+    of gda_knn_weights_sub() are not the rows of the serial build (the kernel values and the order
+    of the neighbors differ), even with adaptive bandwidth.
+
+    Returns:
+        Weight: An instance of Weight class
+    '''
+    num_obs = geoda_obj.num_obs
+    gda = geoda_obj.gda
+
+    # every chunk builds its own kd-tree of all points, so a chunk is not too small
+    min_chunk = 1000
+    if cpu_threads is None or kernel or len(chunk_ranges(num_obs, cpu_threads, min_chunk)) <= 1:
+        return Weight(gda_knn_weights(gda, k, power, is_inverse, is_arc, is_mile, kernel, bandwidth, adaptive_bandwidth,
+                                      use_kernel_diagonals, polyid))
+
+    def run(start, end):
+        gda_w = gda_knn_weights_sub(gda, k, start, end, power, is_inverse, is_arc, is_mile, kernel, bandwidth,
+                                    adaptive_bandwidth, use_kernel_diagonals, polyid)
+        # the rows of the sub weights are either all observations or only the chunk
+        first = start if gda_w.num_obs == num_obs else 0
+        return _weights_to_csr(gda_w, range(first, first + end - start))
+
+    parts = map_chunks(run, num_obs, cpu_threads, min_chunk)
 
-    return Weight(gda_w)
\ No newline at end of file
+    counts = np.concatenate([np.diff(indptr) for indptr, _, _ in parts])
+    indptr = np.zeros(num_obs + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    indices = np.concatenate([indices for _, indices, _ in parts])
+    data = np.concatenate([data for _, _, data in parts])
+    return Weight.from_csr(indptr, indices, data)
@@ -0,0 +1,161 @@
+import os
+import json
+import numpy as np
+
+from .weight import Weight
+
+__author__ = "Xun Li <lixun910@gmail.com>"
+
+GWB_MAGIC = b"GEODAGWB"
+GWB_VERSION = 1
+# sections are aligned so that they can be memory-mapped as NumPy arrays
+GWB_ALIGN = 64
+
+def _align(pos):
+    return -(-pos // GWB_ALIGN) * GWB_ALIGN
+
+def write_gwb(w, file_path, layer_name="", id_name="", id_values=None, value_dtype=np.float64):
+    """Write spatial weights to a binary .gwb file
+
+    The file contains a JSON header followed by the CSR arrays of the weights
+    (int32 or int64 offsets and neighbor indices, float32 or float64 weights values)
+    and the id column. Binary weights are stored without the weights values.
+
+    Args:
+        w (Weight): An instance of Weight class
+        file_path (str): The path of the output .gwb file
+        layer_name (str, optional): The name of the layer of input dataset
+        id_name (str, optional): The id name (or field name) of the id values
+        id_values (tuple, optional): The values of the id column, integers or strings
+        value_dtype (numpy.dtype, optional): float64 (default) or float32 for the weights values
+    """
+    value_dtype = np.dtype(value_dtype)
+    if value_dtype not in (np.dtype(np.float32), np.dtype(np.float64)):
+        raise ValueError("The value_dtype has to be float32 or float64.")
+
+    indptr, indices, data = w.to_csr()
+    idx_type = np.dtype(np.int32) if max(len(indices), w.num_obs) < 2**31 else np.dtype(np.int64)
+
+    sections = [("indptr", np.ascontiguousarray(indptr, dtype=idx_type.newbyteorder('<'))),
+                ("indices", np.ascontiguousarray(indices, dtype=idx_type.newbyteorder('<')))]
+    if not np.all(data == 1):
+        sections.append(("data", np.ascontiguousarray(data, dtype=value_dtype.newbyteorder('<'))))
+    if id_values is not None:
+        if len(id_values) != w.num_obs:
+            raise ValueError("The size of id_values does not match the number of observations.")
+        ids = np.asarray(id_values)
+        if ids.dtype.kind in 'iu':
+            ids = ids.astype('<i8')
+        else:
+            ids = np.char.encode(ids.astype(str), 'utf-8')
+        sections.append(("ids", ids))
+
+    header = {
+        "version": GWB_VERSION,
+        "num_obs": int(w.num_obs),
+        "nnz": int(len(indices)),
+        "layer_name": layer_name,
+        "id_name": id_name,
+        "is_symmetric": bool(w.is_symmetric()),
+        "sparsity": float(w.weights_sparsity()),
+        "min_nbrs": int(w.min_neighbors()),
+        "max_nbrs": int(w.max_neighbors()),
+        "mean_nbrs": float(w.mean_neighbors()),
+        "median_nbrs": float(w.median_neighbors()),
+        "weight_type": int(w.weights_type()),
+        "sections": {},
+    }
+
+    # the header size depends on the section offsets, so reserve enough space first
+    header_size = _align(len(GWB_MAGIC) + 4 + len(json.dumps(header)) + 128 * (len(sections) + 1))
+    pos = header_size
+    for name, arr in sections:
+        header["sections"][name] = {"offset": pos, "dtype": arr.dtype.str, "count": int(arr.size)}
+        pos = _align(pos + arr.nbytes)
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    if len(GWB_MAGIC) + 4 + len(header_bytes) > header_size:
+        raise ValueError("The header of the .gwb file is too large.")
+
+    with open(file_path, 'wb') as f:
+        f.write(GWB_MAGIC)
+        f.write(np.uint32(len(header_bytes)).astype('<u4').tobytes())
+        f.write(header_bytes)
+        for name, arr in sections:
+            f.seek(header["sections"][name]["offset"])
+            f.write(arr.tobytes())
+        f.truncate(pos)
+
+def read_gwb_header(file_path):
+    """Read the JSON header of a binary .gwb weights file
+
+    Args:
+        file_path (str): The path of the .gwb file
+
+    Returns:
+        dict: The header, including the number of observations and the neighbor statistics
+    """
+    with open(file_path, 'rb') as f:
+        if f.read(len(GWB_MAGIC)) != GWB_MAGIC:
+            raise ValueError("The file is not a .gwb weights file.")
+        header_len = int(np.frombuffer(f.read(4), dtype='<u4')[0])
+        header = json.loads(f.read(header_len).decode('utf-8'))
+    if header.get("version", 0) > GWB_VERSION:
+        raise ValueError("The version of the .gwb weights file is not supported.")
+    return header
+
+def _read_section(file_path, section, mmap):
+    dtype = np.dtype(section["dtype"])
+    if section["count"] == 0:
+        return np.zeros(0, dtype=dtype)
+    if mmap:
+        return np.memmap(file_path, dtype=dtype, mode='r', offset=section["offset"], shape=(section["count"],))
+    with open(file_path, 'rb') as f:
+        f.seek(section["offset"])
+        arr = np.fromfile(f, dtype=dtype, count=section["count"])
+    arr.flags.writeable = False
+    return arr
+
+def read_gwb(file_path, **kwargs):
+    """Read GWB Weights
+    Create a spatial weights object from a binary .gwb file (see Weight.save_weights()).
+    The arrays are memory-mapped, so loading does not depend on the size of the weights
+    and the pages are shared by the processes reading the same file.
+
+    Args:
+        file_path (str): The file path of the .gwb file
+        mmap (bool, optional): A bool flag indicates if the file is memory-mapped. Defaults to True.
+        with_ids (bool, optional): A bool flag indicates if the id values are returned as well. Defaults to False.
+
+    Returns:
+        Weight: An instance of Weight class, or a tuple of (Weight, ids) if with_ids is True
+    """
+    mmap = True if 'mmap' not in kwargs else kwargs['mmap']
+    with_ids = False if 'with_ids' not in kwargs else kwargs['with_ids']
+
+    if not os.path.exists(file_path):
+        raise ValueError("The weights file does not exist.")
+
+    header = read_gwb_header(file_path)
+    sections = header["sections"]
+    indptr = _read_section(file_path, sections["indptr"], mmap)
+    indices = _read_section(file_path, sections["indices"], mmap)
+    # binary weights get their values on first use (see Weight.to_csr())
+    data = _read_section(file_path, sections["data"], mmap) if "data" in sections else None
+
+    if len(indptr) != header["num_obs"] + 1 or len(indices) != header["nnz"]:
+        raise ValueError("The content of weights file is not correct.")
+
+    w = Weight(csr=(indptr, indices, data))
+    w._stats = {nm: header[nm] for nm in ("is_symmetric", "sparsity", "min_nbrs", "max_nbrs",
+                                          "mean_nbrs", "median_nbrs", "weight_type")}
+
+    if not with_ids:
+        return w
+
+    ids = None
+    if "ids" in sections:
+        ids = _read_section(file_path, sections["ids"], mmap)
+        if ids.dtype.kind == 'S':
+            ids = np.char.decode(ids, 'utf-8')
+    return w, ids
@@ -1,7 +1,9 @@
 __author__ = "Xun Li <lixun910@gmail.com>"
 
-from ..libgeoda import gda_distance_weights, gda_knn_weights
+from ..libgeoda import gda_distance_weights
 from .weight import Weight
+from .cache import cached_weights
+from .distance import knn_weights_threaded
 
 def kernel_weights(geoda_obj, bandwidth, kernel, **kwargs):
     '''Distance-based Kernel Spatial Weights
@@ -34,9 +36,11 @@ def kernel_weights(geoda_obj, bandwidth, kernel, **kwargs):
 
     poly_id = ""
     
-    gda_w = gda_distance_weights(geoda_obj.gda, bandwidth, poly_id, power, is_inverse, is_arc, is_mile, kernel, use_kernel_diagonals)
+    params = {'bandwidth': bandwidth, 'kernel': kernel, 'use_kernel_diagonals': use_kernel_diagonals,
+              'power': power, 'is_inverse': is_inverse, 'is_arc': is_arc, 'is_mile': is_mile}
+    build = lambda: Weight(gda_distance_weights(geoda_obj.gda, bandwidth, poly_id, power, is_inverse, is_arc, is_mile, kernel, use_kernel_diagonals))
 
-    return Weight(gda_w)
+    return cached_weights(geoda_obj, 'kernel_weights', params, build)
 
 
 def kernel_knn_weights(geoda_obj, k, kernel, **kwargs):
@@ -54,6 +58,9 @@ def kernel_knn_weights(geoda_obj, k, kernel, **kwargs):
         power (float, optional): The power (or exponent) of a number indicates how many times to use the number in a multiplication.
         is_arc (bool, optional): A bool flag indicates if compute arc distance or Euclidean distance. Defaults to False (Euclidean distance) 
         is_mile (bool, optional): A bool flag indicates if the distance unit is mile or km. Defaults to True (mile).
+        cpu_threads (int, optional): Not supported: the kernel weights are built by the single-threaded libgeoda
+            builder, because the kernel weights built by chunks differ from it (see knn_weights_threaded()).
+            A ValueError is raised if it is given.
 
     Returns:
         Weight: An instance of Weight class 
@@ -61,6 +68,9 @@ def kernel_knn_weights(geoda_obj, k, kernel, **kwargs):
     if kernel not in ['triangular', 'uniform', 'epanechnikov', 'quartic', 'gaussian']:
         raise("The parameter 'kernel' has to be one of 'triangular', 'uniform', 'epanechnikov', 'quartic', 'gaussian'")
 
+    if kwargs.get('cpu_threads') is not None:
+        raise ValueError("The kernel knn weights can not be built with multiple cpu threads, please remove cpu_threads.")
+
     adaptive_bandwidth = True if 'adaptive_bandwidth' not in kwargs else kwargs['adaptive_bandwidth']
     use_kernel_diagonals = False if 'use_kernel_diagonals' not in kwargs else kwargs['use_kernel_diagonals']
     power = 1.0 if 'power' not in kwargs else kwargs['power']
@@ -69,7 +79,10 @@ def kernel_knn_weights(geoda_obj, k, kernel, **kwargs):
     is_mile = True if 'is_mile' not in kwargs else kwargs['is_mile']
     bandwidth = 0
     polyid = ""
-    
-    gda_w = gda_knn_weights(geoda_obj.gda, k, power, is_inverse, is_arc, is_mile, kernel, bandwidth, adaptive_bandwidth, use_kernel_diagonals, polyid)
 
-    return Weight(gda_w)
\ No newline at end of file
+    params = {'k': k, 'kernel': kernel, 'adaptive_bandwidth': adaptive_bandwidth, 'use_kernel_diagonals': use_kernel_diagonals,
+              'power': power, 'is_inverse': is_inverse, 'is_arc': is_arc, 'is_mile': is_mile}
+    build = lambda: knn_weights_threaded(geoda_obj, k, None, power, is_inverse, is_arc, is_mile, kernel, bandwidth,
+                                         adaptive_bandwidth, use_kernel_diagonals, polyid)
+
+    return cached_weights(geoda_obj, 'kernel_knn_weights', params, build)
\ No newline at end of file
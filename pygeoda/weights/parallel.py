@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+__author__ = "Xun Li <lixun910@gmail.com>"
+
+def chunk_ranges(num_obs, cpu_threads, min_chunk=10000):
+    """Split the observations into contiguous [start, end) ranges, one per thread
+
+    Args:
+        num_obs (int): The number of observations
+        cpu_threads (int): The number of cpu threads
+        min_chunk (int): The minimum number of observations per range
+
+    Returns:
+        list: A list of (start, end) tuples
+    """
+    num_chunks = max(1, min(int(cpu_threads), -(-num_obs // min_chunk)))
+    bounds = np.linspace(0, num_obs, num_chunks + 1).astype(np.int64).tolist()
+    return [(bounds[i], bounds[i + 1]) for i in range(num_chunks) if bounds[i] < bounds[i + 1]]
+
+def map_chunks(func, num_obs, cpu_threads, min_chunk=10000):
+    """Run func(start, end) over the chunks of observations in a thread pool
+
+    NumPy and libgeoda release the GIL, so the chunks run in parallel.
+
+    Args:
+        func (function): A function of (start, end)
+        num_obs (int): The number of observations
+        cpu_threads (int): The number of cpu threads
+        min_chunk (int): The minimum number of observations per chunk
+
+    Returns:
+        list: The results of func in the order of the chunks
+    """
+    if cpu_threads < 1:
+        raise ValueError("The number of CPU threads has to be a positive integer number.")
+
+    ranges = chunk_ranges(num_obs, cpu_threads, min_chunk)
+    if len(ranges) <= 1:
+        return [func(start, end) for start, end in ranges]
+
+    with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+        return list(pool.map(lambda r: func(*r), ranges))
@@ -1,5 +1,6 @@
 from ..libgeoda import gda_queen_weights 
-from .weight import Weight
+from .cache import cached_weights
+from .contiguity import contiguity_order_weights
 
 __author__ = "Xun Li <lixun910@gmail.com>"
 
@@ -9,12 +10,17 @@ def queen_weights(geoda_obj, **kwargs):
     
     Args:
         geoda_obj (geoda): An instance of Geoda object
-        order (int, optional): An integer value of order of contiguity
+        order (int, optional): An integer value of order of contiguity. The higher orders are derived from
+            the first order contiguity when an order 1 call has kept it in memory for the same geoda object,
+            or when cpu_threads is given.
         include_lower_order (bool, optional):  A bool flag indicates whether or not the lower order neighbors should be 
             included in the weights structure. Defaults to False.
         precision_threshold  (float, optional):  A float value represents the precision of the underlying shape file is insufficient 
             to allow for an exact match of coordinates to determine 
             which polygons are neighbors. Defaults to 0.0.
+        cpu_threads (int, optional): The number of cpu threads used to build first order contiguity from the
+            shared vertices of the polygons. The result is the same for any number of threads.
+            Defaults to None, which uses the single-threaded libgeoda builder.
 
     Returns:
         Weight: An instance of Weight class 
@@ -22,8 +28,14 @@ def queen_weights(geoda_obj, **kwargs):
     order = 1 if 'order' not in kwargs else kwargs['order']
     include_lower_order = False if 'include_lower_order' not in kwargs else kwargs['include_lower_order']
     precision_threshold = 0.0 if 'precision_threshold' not in kwargs else kwargs['precision_threshold']
+    cpu_threads = None if 'cpu_threads' not in kwargs else kwargs['cpu_threads']
 
-    gda_w = gda_queen_weights(geoda_obj.gda, order, include_lower_order, precision_threshold)
+    def build():
+        return contiguity_order_weights(geoda_obj, gda_queen_weights, False, order, include_lower_order,
+                                        precision_threshold, cpu_threads)
 
-    return Weight(gda_w)
+    params = {'order': order, 'include_lower_order': include_lower_order, 'precision_threshold': precision_threshold,
+              'multi_threaded': cpu_threads is not None}
+
+    return cached_weights(geoda_obj, 'queen_weights', params, build)
 
@@ -1,5 +1,6 @@
 from ..libgeoda import gda_rook_weights 
-from .weight import Weight
+from .cache import cached_weights
+from .contiguity import contiguity_order_weights
 
 __author__ = "Xun Li <lixun910@gmail.com>"
 
@@ -9,12 +10,17 @@ def rook_weights(geoda_obj, **kwargs):
     
     Args:
         geoda_obj (geoda): An instance of geoda class
-        order (int, optional): order of contiguity
+        order (int, optional): order of contiguity. The higher orders are derived from the first order
+            contiguity when an order 1 call has kept it in memory for the same geoda object, or when
+            cpu_threads is given.
         include_lower_order (bool, optional):  whether or not the lower order neighbors should be 
             included in the weights structure
         precision_threshold  (float, optional):  the precision of the underlying shape file is insufficient 
             to allow for an exact match of coordinates to determine 
             which polygons are neighbors
+        cpu_threads (int, optional): The number of cpu threads used to build first order contiguity from the
+            shared edges of the polygons. The result is the same for any number of threads.
+            Defaults to None, which uses the single-threaded libgeoda builder.
 
     Returns:
         Weight: An instance of Weight object
@@ -22,8 +28,14 @@ def rook_weights(geoda_obj, **kwargs):
     order = 1 if 'order' not in kwargs else kwargs['order']
     include_lower_order = False if 'include_lower_order' not in kwargs else kwargs['include_lower_order']
     precision_threshold = 0.0 if 'precision_threshold' not in kwargs else kwargs['precision_threshold']
-    
-    gda_w = gda_rook_weights(geoda_obj.gda, order, include_lower_order, precision_threshold)
+    cpu_threads = None if 'cpu_threads' not in kwargs else kwargs['cpu_threads']
+
+    def build():
+        return contiguity_order_weights(geoda_obj, gda_rook_weights, True, order, include_lower_order,
+                                        precision_threshold, cpu_threads)
+
+    params = {'order': order, 'include_lower_order': include_lower_order, 'precision_threshold': precision_threshold,
+              'multi_threaded': cpu_threads is not None}
 
-    return Weight(gda_w)
+    return cached_weights(geoda_obj, 'rook_weights', params, build)
 
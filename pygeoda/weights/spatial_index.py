@@ -0,0 +1,246 @@
+import math
+import numpy as np
+
+from .parallel import map_chunks
+
+__author__ = "Xun Li <lixun910@gmail.com>"
+
+# the earth radius used for arc distance, in kilometers and in miles
+# (converted with the same factor as libgeoda)
+EARTH_RADIUS_KM = 6371.0
+EARTH_RADIUS_MI = EARTH_RADIUS_KM / 1.609344
+
+# the kd-tree rounds distances differently than libgeoda, so the searches use a slightly
+# larger radius, and the neighbors found are checked with the distance of libgeoda
+_SEARCH_RTOL = 1e-12
+
+# the trigonometric functions are called one value at a time with the math module (the C
+# library used by libgeoda), as numpy's vectorized versions may round differently
+def _vmath(func, values):
+    return np.fromiter(map(func, values.tolist()), dtype=np.float64, count=len(values))
+
+def _unit_vectors(lonlat):
+    """Get the 3-D unit vectors of (longitude, latitude) points in degrees, as libgeoda
+    """
+    lon, lat = lonlat[:, 0] * (math.pi / 180.0), lonlat[:, 1] * (math.pi / 180.0)
+    cos_lat = _vmath(math.cos, lat)
+    return np.column_stack([cos_lat * _vmath(math.cos, lon), cos_lat * _vmath(math.sin, lon), _vmath(math.sin, lat)])
+
+def _unit_to_lonlat_rad(points):
+    """Get the (longitude, latitude) in radians of 3-D unit vectors, as libgeoda
+    """
+    lat = _vmath(math.asin, points[:, 2])
+    lat = np.where(lat > math.pi / 2.0, math.pi - lat, lat)
+    lon = np.fromiter(map(math.atan2, points[:, 1].tolist(), points[:, 0].tolist()), dtype=np.float64,
+                      count=len(points))
+    # NormLonRad(): (|lon| + pi) mod 2pi - pi, with the sign of lon
+    norm = _vmath(lambda v: math.fmod(v + math.pi, math.pi * 2.0), np.abs(lon)) - math.pi
+    return np.where(lon < 0, -norm, norm), lat
+
+def _arc_dist_rad(lon1, lat1, lon2, lat2):
+    """The haversine distance in radians, as LonLatRadDistRad() of libgeoda
+    """
+    sin_lat = _vmath(math.sin, (lat2 - lat1) / 2.0)
+    sin_lon = _vmath(math.sin, (lon2 - lon1) / 2.0)
+    a = sin_lat * sin_lat + _vmath(math.cos, lat1) * _vmath(math.cos, lat2) * (sin_lon * sin_lon)
+    return 2.0 * np.fromiter(map(math.atan2, np.sqrt(a).tolist(), np.sqrt(1.0 - a).tolist()),
+                             dtype=np.float64, count=len(a))
+
+class SpatialIndex:
+    """
+    A kd-tree of the centroids (or points) of a dataset
+
+    The index is built once per geoda object and distance setting (see geoda.spatial_index()),
+    and is shared by the distance and k-nearest neighbors based weights. The neighbors of an
+    observation never include the observation itself.
+
+    For arc distance, the (longitude, latitude) centroids are indexed as 3-D unit vectors:
+    the straight (chord) distance between two unit vectors increases with their great-circle
+    distance, so the kd-tree searches prune as well as for the Euclidean distance.
+
+    The points and distances are computed as libgeoda does, with the same rounding, so that
+    the index finds the same neighbors as libgeoda when it is built from libgeoda's centroids
+    (see geoda.spatial_index()).
+
+    Attributes:
+        num_obs (int): The number of observations
+        points (ndarray): A (n, 2) float64 array of the centroids, or (n, 3) unit vectors for arc distance
+        is_arc (bool): A bool flag indicates if the index is for arc distance
+        is_mile (bool): A bool flag indicates if the arc distance unit is mile or km
+    """
+    def __init__(self, points, is_arc=False, is_mile=True):
+        try:
+            from scipy.spatial import cKDTree
+        except ImportError:
+            raise ImportError("scipy is required to build the spatial index. Please install scipy.")
+
+        points = np.ascontiguousarray(points, dtype=np.float64)
+        if points.ndim != 2 or points.shape[1] != 2:
+            raise ValueError("The points of the spatial index have to be a (n, 2) array.")
+        if np.isnan(points).any():
+            raise ValueError("The points of the spatial index contain NaN values.")
+
+        self.num_obs = len(points)
+        self.points = _unit_vectors(points) if is_arc else points
+        self.is_arc = is_arc
+        self.is_mile = is_mile
+        self.earth_radius = EARTH_RADIUS_MI if is_mile else EARTH_RADIUS_KM
+        self.tree = cKDTree(self.points)
+        self._nn_dists = None
+
+    def _to_search_dist(self, dist):
+        """Convert an arc distance to the chord distance of unit vectors, as RadToUnitDist() of libgeoda
+        """
+        if not self.is_arc:
+            return dist
+        angle = abs(dist / self.earth_radius)
+        if angle > math.pi:
+            angle = math.fmod(angle, 2.0 * math.pi)
+            angle = angle if angle <= math.pi else 2.0 * math.pi - angle
+        if angle >= math.pi:
+            return 2.0
+        t = 2.0 - 2.0 * math.cos(angle)
+        return math.sqrt(t) if t > 0 else 0.0
+
+    def _dists(self, rows, nbrs):
+        """Get the straight (Euclidean or chord) distances of pairs of observations,
+        rounded as the boost.geometry distance of libgeoda
+        """
+        diff = self.points[rows] - self.points[nbrs]
+        sq = diff[:, 0] * diff[:, 0] + diff[:, 1] * diff[:, 1]
+        if self.is_arc:
+            sq = sq + diff[:, 2] * diff[:, 2]
+        return np.sqrt(sq)
+
+    def _rows(self, start, end):
+        end = self.num_obs if end is None else end
+        return np.arange(start, end)
+
+    def knn(self, k, start=0, end=None):
+        """Find the k-nearest neighbors of the observations [start, end)
+
+        Args:
+            k (int): A positive integer number for k-nearest neighbors
+            start (int, optional): The first observation. Defaults to 0.
+            end (int, optional): The end (exclusive) of the observations. Defaults to None (all).
+
+        Returns:
+            tuple: The (m, k) arrays of the straight (Euclidean or chord) distances and the
+                indices of the neighbors, sorted by distance
+        """
+        if k < 1 or k >= self.num_obs:
+            raise ValueError("The k has to be a positive integer number less than the number of observations.")
+
+        rows = self._rows(start, end)
+        dists, nbrs = self.tree.query(self.points[rows], k + 1)
+        dists, nbrs = dists.reshape(len(rows), k + 1), nbrs.reshape(len(rows), k + 1)
+
+        # drop the observation itself, or the farthest neighbor if itself is not found
+        # (more than k observations at the same location)
+        is_self = nbrs == rows[:, None]
+        is_self[~is_self.any(axis=1), -1] = True
+        is_self &= np.cumsum(is_self, axis=1) == 1
+        keep = ~is_self
+        return dists[keep].reshape(len(rows), k), nbrs[keep].reshape(len(rows), k)
+
+    def nn_distances(self, cpu_threads=1):
+        """Get the distance of every observation to its nearest neighbor
+        The distances are searched in parallel on first use and kept in the index. They are
+        computed as the ones of libgeoda's min_distthreshold(): the Euclidean distance, or
+        the haversine distance of the nearest unit vector.
+
+        Args:
+            cpu_threads (int, optional): The number of cpu threads. Defaults to 1.
+
+        Returns:
+            ndarray: A read-only float64 array of the nearest neighbor distances
+        """
+        if self._nn_dists is None:
+            _, nbrs, _ = index_knn_csr(self, 1, cpu_threads)
+            rows = np.arange(self.num_obs)
+            if self.is_arc:
+                lon, lat = _unit_to_lonlat_rad(self.points)
+                dists = _arc_dist_rad(lon, lat, lon[nbrs], lat[nbrs]) * self.earth_radius
+            else:
+                dists = self._dists(rows, nbrs)
+            dists.flags.writeable = False
+            self._nn_dists = dists
+        return self._nn_dists
+
+    def radius(self, dist_thres, start=0, end=None):
+        """Find the neighbors within a distance of the observations [start, end)
+
+        Args:
+            dist_thres (float): The distance threshold, inclusive
+            start (int, optional): The first observation. Defaults to 0.
+            end (int, optional): The end (exclusive) of the observations. Defaults to None (all).
+
+        Returns:
+            tuple: The int64 CSR offsets and indices of the neighbors, sorted by index
+        """
+        owner, nbrs = self._radius_pairs(dist_thres, start, end)
+        rows = self._rows(start, end)
+
+        order = np.lexsort((nbrs, owner))
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(owner, minlength=len(rows)), out=indptr[1:])
+        return indptr, nbrs[order]
+
+    def count(self, dist_thres, start=0, end=None):
+        """Count the neighbors within a distance of the observations [start, end), without finding them
+
+        Returns:
+            ndarray: The int64 numbers of neighbors
+        """
+        owner, _ = self._radius_pairs(dist_thres, start, end)
+        return np.bincount(owner, minlength=len(self._rows(start, end))).astype(np.int64)
+
+    def _radius_pairs(self, dist_thres, start, end):
+        """Get the (row - start, neighbor) pairs within a distance, found as libgeoda does:
+        the straight distance is at most the (chord) threshold
+        """
+        from scipy.spatial import cKDTree
+
+        rows = self._rows(start, end)
+        search_dist = self._to_search_dist(dist_thres)
+        # a tree of the chunk joined with the tree of all points returns the pairs as arrays
+        pairs = cKDTree(self.points[rows]).sparse_distance_matrix(self.tree, search_dist * (1.0 + _SEARCH_RTOL),
+                                                                  output_type='ndarray')
+        owner, nbrs = pairs['i'], pairs['j']
+        keep = nbrs != owner + start
+        owner, nbrs = owner[keep], nbrs[keep]
+        keep = self._dists(owner + start, nbrs) <= search_dist
+        return owner[keep], nbrs[keep]
+
+def index_knn_csr(index, k, cpu_threads=1):
+    """Get the k-nearest neighbors of all observations as CSR arrays, searched in parallel
+
+    Returns:
+        tuple: The int64 offsets, indices and the distances of the neighbors
+    """
+    parts = map_chunks(lambda start, end: index.knn(k, start, end), index.num_obs, cpu_threads)
+    dists = np.concatenate([d for d, _ in parts]).ravel()
+    nbrs = np.concatenate([i for _, i in parts]).ravel()
+    indptr = np.arange(0, index.num_obs * k + 1, k, dtype=np.int64)
+    return indptr, nbrs.astype(np.int64), dists
+
+def index_radius_csr(index, dist_thres, cpu_threads=1):
+    """Get the neighbors within a distance of all observations as CSR arrays, searched in parallel
+
+    Returns:
+        tuple: The int64 offsets and indices of the neighbors
+    """
+    parts = map_chunks(lambda start, end: index.radius(dist_thres, start, end), index.num_obs, cpu_threads)
+    counts = np.concatenate([np.diff(indptr) for indptr, _ in parts])
+    indptr = np.zeros(index.num_obs + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    return indptr, np.concatenate([nbrs for _, nbrs in parts])
+
+def index_radius_counts(index, dist_thres, cpu_threads=1):
+    """Count the neighbors within a distance of all observations, searched in parallel
+
+    Returns:
+        ndarray: The int64 numbers of neighbors
+    """
+    parts = map_chunks(lambda start, end: index.count(dist_thres, start, end), index.num_obs, cpu_threads)
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
@@ -1,12 +1,25 @@
 from ..libgeoda import GeoDa, VecInt, VecInt64, gda_load_gal, gda_load_gwt, gda_load_swm, GeoDaWeight
+from itertools import chain
+import numpy as np
+import os
+import time
+import logging
+import tempfile
+from .parallel import map_chunks
 
 __author__ = "Xun Li <lixun910@gmail.com>"
 
+logger = logging.getLogger(__name__)
+
 class Weight:
     """
     GeoDa Weight class 
+
+    A Weight object is backed by a libgeoda GeoDaWeight object, or by CSR arrays
+    (see Weight.from_csr), in which case the GeoDaWeight object is only created
+    when a libgeoda function needs it.
     """
-    def __init__(self, gda_w):
+    def __init__(self, gda_w=None, csr=None):
         """
         Constructor of Weight class.
 
@@ -14,9 +27,107 @@ class Weight:
         ----------
         gda_w : Object
             A libgeoda GeoDaWeight pointer
+        csr : tuple
+            (indptr, indices, data) arrays of the weights, used if gda_w is None.
+            data can be None for binary weights, the values are created on first use by to_csr()
+        """
+        if gda_w is None and csr is None:
+            raise ValueError("Either a GeoDaWeight object or CSR arrays are required to create Weight.")
+
+        self._gda_w = gda_w
+        self._csr = csr
+        self._stats = None
+        # a function that loads the GeoDaWeight object from the file the weights are read from
+        self._gda_w_loader = None
+        self.num_obs = gda_w.num_obs if gda_w is not None else len(csr[0]) - 1
+
+    @classmethod
+    def from_csr(cls, indptr, indices, data=None):
+        """
+        Create spatial weights from compressed sparse row (CSR) arrays
+
+        The neighbors of the i-th observation are indices[indptr[i]:indptr[i+1]]
+        with the weights data[indptr[i]:indptr[i+1]].
+
+        Parameters
+        ----------
+        indptr : array_like
+            The n + 1 row offsets
+        indices : array_like
+            The 0-based indices of the neighbors
+        data : array_like
+            The weights values, default is 1.0 for all neighbors (binary weights)
+
+        Returns
+        -------
+        w : Weight
+            An instance of Weight class
+        """
+        indptr = np.asarray(indptr)
+        indices = np.asarray(indices)
+        data = np.ones(len(indices), dtype=np.float64) if data is None else np.asarray(data, dtype=np.float64)
+
+        if indptr.ndim != 1 or len(indptr) < 2:
+            raise ValueError("The indptr has to be a 1-d array of n + 1 row offsets.")
+        if indptr[0] != 0 or np.any(np.diff(indptr) < 0) or indptr[-1] != len(indices):
+            raise ValueError("The indptr has to be non-decreasing, starting at 0 and ending at len(indices).")
+        if len(data) != len(indices):
+            raise ValueError("The data and indices have to be the same length.")
+
+        num_obs = len(indptr) - 1
+        if len(indices) > 0 and (indices.min() < 0 or indices.max() >= num_obs):
+            raise ValueError("The indices have to be in the range [0, n).")
+
+        idx_type = np.int32 if max(len(indices), num_obs) < 2**31 else np.int64
+        csr = (indptr.astype(idx_type), indices.astype(idx_type), data.copy())
+        for arr in csr:
+            arr.flags.writeable = False
+
+        return cls(csr=csr)
+
+    @classmethod
+    def from_sparse(cls, matrix):
         """
-        self.gda_w = gda_w
-        self.num_obs = gda_w.num_obs
+        Create spatial weights from a scipy.sparse matrix
+
+        Parameters
+        ----------
+        matrix : scipy.sparse matrix
+            A n x n matrix, the non-zero entries of the i-th row are the neighbors of
+            the i-th observation
+
+        Returns
+        -------
+        w : Weight
+            An instance of Weight class
+        """
+        if matrix.shape[0] != matrix.shape[1]:
+            raise ValueError("The sparse matrix of spatial weights has to be square.")
+
+        m = matrix.tocsr()
+        return cls.from_csr(m.indptr, m.indices, m.data)
+
+    @property
+    def gda_w(self):
+        """The libgeoda GeoDaWeight object, created on first access for CSR-backed weights
+
+        libgeoda can't take the CSR arrays directly: the weights are written to a temporary
+        GAL (binary weights) or GWT text file and loaded by libgeoda, which costs a pass over
+        all neighbor pairs, once per Weight. It is paid by the functions that run in libgeoda,
+        e.g. the LISA statistics, but not by the statistics of the weights, to_csr() or spatial_lag().
+        The weights read by read_gal() and read_gwt() are loaded by libgeoda from their file
+        instead, if it is unchanged.
+        """
+        if self._gda_w is None:
+            gda_w = self._gda_w_loader() if self._gda_w_loader is not None else None
+            self._gda_w_loader = None
+            self._gda_w = gda_w if gda_w is not None else _csr_to_gda_w(*self._csr)
+        return self._gda_w
+
+    def _nbr_stats(self):
+        if self._stats is None:
+            self._stats = _csr_stats(*self.to_csr())
+        return self._stats
 
     def is_symmetric(self):
         """
@@ -32,8 +143,9 @@ class Weight:
             True means symmetric weights matrix, e.g. contiguity weights
             False means assymmetric weights matrix, e.g. distance-based weights
         """
-        if self.gda_w != None:
-            return self.gda_w.is_symmetric
+        if self._gda_w is not None:
+            return self._gda_w.is_symmetric
+        return self._nbr_stats()["is_symmetric"]
 
     def has_isolates(self):
         """
@@ -49,8 +161,9 @@ class Weight:
             True means at least one observation has no neighbors 
             False means all observations have at least one neighbor
         """
-        if self.gda_w != None:
-            return self.gda_w.HasIsolates()
+        if self._gda_w is not None:
+            return self._gda_w.HasIsolates()
+        return self._nbr_stats()["min_nbrs"] == 0
 
     def weights_sparsity(self):
         """
@@ -61,8 +174,9 @@ class Weight:
         sparsity : float
             sparsity is computed as (#obs w/ neighbor) / (total # obs)
         """
-        if self.gda_w != None:
-            return self.gda_w.sparsity
+        if self._gda_w is not None:
+            return self._gda_w.sparsity
+        return self._nbr_stats()["sparsity"]
 
     def min_neighbors(self):
         """Get minmum number of neighbors
@@ -70,8 +184,9 @@ class Weight:
         Returns:
             int: The number of minimum neighbors 
         """
-        if self.gda_w != None:
-            return self.gda_w.min_nbrs
+        if self._gda_w is not None:
+            return self._gda_w.min_nbrs
+        return self._nbr_stats()["min_nbrs"]
 
     def median_neighbors(self):
         """Get the median number of neighbors
@@ -79,8 +194,9 @@ class Weight:
         Returns:
             float: The number of median neighbors 
         """
-        if self.gda_w != None:
-            return self.gda_w.median_nbrs
+        if self._gda_w is not None:
+            return self._gda_w.median_nbrs
+        return self._nbr_stats()["median_nbrs"]
 
     def mean_neighbors(self):
         """Get the mean number of neighbors
@@ -88,8 +204,9 @@ class Weight:
         Returns:
             float: The number of mean neighbors 
         """
-        if self.gda_w != None:
-            return self.gda_w.mean_nbrs
+        if self._gda_w is not None:
+            return self._gda_w.mean_nbrs
+        return self._nbr_stats()["mean_nbrs"]
 
     def max_neighbors(self):
         """Get the maximum number of neighbors
@@ -97,8 +214,9 @@ class Weight:
         Returns:
             int: The number of maximum neighbors 
         """
-        if self.gda_w != None:
-            return self.gda_w.max_nbrs
+        if self._gda_w is not None:
+            return self._gda_w.max_nbrs
+        return self._nbr_stats()["max_nbrs"]
 
     def weights_type(self):
         """Get Weights type
@@ -106,8 +224,9 @@ class Weight:
         Returns:
             int: weights type
         """
-        if self.gda_w != None:
-            return self.gda_w.weight_type
+        if self._gda_w is not None:
+            return self._gda_w.weight_type
+        return self._nbr_stats()["weight_type"]
 
 
     def get_neighbors(self, idx):
@@ -124,33 +243,122 @@ class Weight:
         nbrs : tuple
             a tuple of ids of neighbors of specified idx-th observation.
         """
-        if self.gda_w != None:
-            return self.gda_w.GetNeighbors(idx)
+        if self._gda_w is not None:
+            return self._gda_w.GetNeighbors(idx)
+        indptr, indices, _ = self._csr
+        return tuple(indices[indptr[idx]:indptr[idx + 1]].tolist())
+
+    def get_neighbors_weights(self, idx):
+        """
+        Get the weights values of the neighbors of idx-th observation
+
+        Parameters
+        ----------
+        idx : int
+            The index of observation
+
+        Returns
+        -------
+        nbr_weights : tuple
+            a tuple of weights values of the neighbors of specified idx-th observation,
+            in the order of get_neighbors().
+        """
+        if self._gda_w is not None:
+            return self._gda_w.GetNeighborWeights(idx)
+        indptr, _, data = self.to_csr()
+        return tuple(data[indptr[idx]:indptr[idx + 1]].tolist())
+
+    def to_csr(self, sparse=False):
+        """
+        Get the spatial weights as a compressed sparse row (CSR) matrix
+
+        The neighbors of the i-th observation are indices[indptr[i]:indptr[i+1]]
+        with the weights data[indptr[i]:indptr[i+1]]. The arrays are extracted
+        once and cached.
+
+        Parameters
+        ----------
+        sparse : Boolean
+            True returns a scipy.sparse.csr_matrix (requires scipy),
+            False returns the CSR arrays
+
+        Returns
+        -------
+        csr : tuple or scipy.sparse.csr_matrix
+            (indptr, indices, data) read-only NumPy arrays, or a csr_matrix
+        """
+        if self._csr is None:
+            self._csr = _weights_to_csr(self.gda_w)
+        elif self._csr[2] is None:
+            data = np.ones(len(self._csr[1]), dtype=np.float64)
+            data.flags.writeable = False
+            self._csr = (self._csr[0], self._csr[1], data)
+
+        if not sparse:
+            return self._csr
 
-    def spatial_lag(self, values):
+        try:
+            from scipy.sparse import csr_matrix
+        except ImportError:
+            raise ImportError("scipy is required to create a sparse matrix. Please install scipy.")
+
+        indptr, indices, data = self._csr
+        return csr_matrix((data, indices, indptr), shape=(self.num_obs, self.num_obs))
+
+    def spatial_lag(self, values, **kwargs):
         """
-        Compute spatial lagged values for values of selected variable 
+        Compute spatial lagged values for values of selected variable(s)
+
+        The lags are computed as a sparse matrix-vector product over the CSR
+        arrays of the weights (see to_csr()), for all variables at once.
 
         Parameters
         ----------
-        values : tuple
-            The tuple of values of selected column
+        values : tuple or numpy.ndarray
+            The values of selected column, or a (n x p) array of p columns
+        standardize : Boolean
+            True (default) divides the sum of the neighboring values by the number
+            of neighbors (or by the sum of the weights if use_weights is True)
+        use_weights : Boolean
+            False (default) treats every neighbor alike, so the default lag is the
+            average of the neighboring values, as gda_w.SpatialLag(); True multiplies
+            the neighboring values by the weights, e.g. the weights of a GWT file
+        cpu_threads : int
+            The number of cpu threads used for parallel computation
 
         Returns
         -------
-        lags : list
-            the computed spatial lagged values:
+        lags : list or numpy.ndarray
+            the computed spatial lagged values: a list for a tuple or list input,
+            otherwise an array of the same shape as values
         """
-        if self.gda_w != None:
-            rst = []
-            for i in range(self.num_obs):
-                rst.append(self.gda_w.SpatialLag(i, values))
-            return rst
+        standardize = True if 'standardize' not in kwargs else kwargs['standardize']
+        use_weights = False if 'use_weights' not in kwargs else kwargs['use_weights']
+        cpu_threads = 6 if 'cpu_threads' not in kwargs else kwargs['cpu_threads']
+
+        arr = np.asarray(values, dtype=np.float64)
+        if arr.ndim not in (1, 2) or arr.shape[0] != self.num_obs:
+            raise ValueError("The values have to be a vector or a (n x p) matrix with n = the number of observations.")
+
+        x = arr.reshape(self.num_obs, -1)
+        indptr, indices, data = self.to_csr()
+        data = data if use_weights else None
+        lags = map_chunks(lambda start, end: _csr_lag(indptr, indices, data, x, standardize, start, end),
+                          self.num_obs, cpu_threads)
+        lags = np.concatenate(lags, axis=0) if lags else np.zeros(x.shape)
+        lags = lags.reshape(arr.shape)
+
+        if isinstance(values, (list, tuple)) and arr.ndim == 1:
+            return lags.tolist()
+        return lags
 
     def save_weights(self, out_path, layer_name, id_name, id_values):
         """
         Save current spatial weights to a file.
 
+        The file format is chosen by the extension of out_path: .gal, .gwt or
+        .gwb (binary, memory-mappable, see read_gwb()).
+
         Parameters
         ----------
         out_path : str
@@ -165,11 +373,92 @@ class Weight:
             The tuple of values of selected id_name (column/field)
 
         """
-        if self.gda_w != None:
+        if out_path.lower().endswith('.gwb'):
+            from .gwb import write_gwb
+            write_gwb(self, out_path, layer_name, id_name, id_values)
+            return True
+
+        if self.gda_w is not None:
             return self.gda_w.Save(out_path, layer_name, id_name, id_values)
 
+    def intersection(self, other, cpu_threads=1):
+        """
+        Get the spatial weights of the neighbors in both weights
+
+        Parameters
+        ----------
+        other : Weight
+            A spatial weights of the same observations
+        cpu_threads : int
+            The number of cpu threads used for parallel computation
+
+        Returns
+        -------
+        w : Weight
+            An instance of Weight class with the weights values of this weights
+        """
+        return _weights_set_op(self, other, "intersection", cpu_threads)
+
+    def union(self, other, cpu_threads=1):
+        """
+        Get the spatial weights of the neighbors in either weights
+
+        Parameters
+        ----------
+        other : Weight
+            A spatial weights of the same observations
+        cpu_threads : int
+            The number of cpu threads used for parallel computation
+
+        Returns
+        -------
+        w : Weight
+            An instance of Weight class with the weights values of this weights,
+            or of the other weights for the neighbors only in the other weights
+        """
+        return _weights_set_op(self, other, "union", cpu_threads)
+
+    def difference(self, other, cpu_threads=1):
+        """
+        Get the spatial weights of the neighbors that are not in the other weights
+
+        Parameters
+        ----------
+        other : Weight
+            A spatial weights of the same observations
+        cpu_threads : int
+            The number of cpu threads used for parallel computation
+
+        Returns
+        -------
+        w : Weight
+            An instance of Weight class with the weights values of this weights
+        """
+        return _weights_set_op(self, other, "difference", cpu_threads)
+
+    def symmetrize(self, cpu_threads=1):
+        """
+        Get the symmetric spatial weights, in which j is a neighbor of i if i is a
+        neighbor of j or j is a neighbor of i, e.g. to symmetrize k-nearest neighbors weights
+
+        Parameters
+        ----------
+        cpu_threads : int
+            The number of cpu threads used for parallel computation
+
+        Returns
+        -------
+        w : Weight
+            An instance of Weight class. The added neighbors take the weights value of
+            the opposite direction.
+        """
+        indptr, indices, data = self.to_csr()
+        rows = np.repeat(np.arange(self.num_obs, dtype=np.int64), np.diff(indptr))
+        transposed = _edges_to_weight(self.num_obs, np.asarray(indices, dtype=np.int64), rows, np.asarray(data))
+        return _weights_set_op(self, transposed, "union", cpu_threads)
+
     def __repr__(self):
-        if self.gda_w:
+        if self._gda_w is not None or self._csr is not None:
             info = ""
             info += "Weights Meta-data:\n"
             info += '{0:>24} {1:>20}\n'.format("number of observations:", self.num_obs) 
@@ -182,63 +471,413 @@ class Weight:
             info += '{0:>24} {1:>20}\n'.format("has isolates:", "True" if self.has_isolates() else "False") 
             return info
 
-def read_gal(file_path, id_vec):
-    """Read GAL Weights
-    Create a spatial weights object from a .GAL file
+def _weights_to_csr(gda_w, rows=None):
+    """Extract the neighbors and weights of a GeoDaWeight object as CSR arrays
 
     Args:
-        file_path (str): The file paht of the .GAL file
-        id_vec (tuple): The id values used in the .GAL file. e.g. [1,2,3,4,...]
+        gda_w (GeoDaWeight): A libgeoda weights object
+        rows (range, optional): The rows to extract. Defaults to all rows.
+    """
+    rows = range(gda_w.num_obs) if rows is None else rows
+    num_obs = len(rows)
+    nbrs = [gda_w.GetNeighbors(i) for i in rows]
+    wts = [gda_w.GetNeighborWeights(i) for i in rows]
+
+    counts = np.fromiter(map(len, nbrs), dtype=np.int64, count=num_obs)
+    indptr = np.zeros(num_obs + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    nnz = int(indptr[-1])
+
+    idx_type = np.int32 if max(nnz, num_obs) < 2**31 else np.int64
+    indptr = indptr.astype(idx_type)
+    indices = np.fromiter(chain.from_iterable(nbrs), dtype=idx_type, count=nnz)
+
+    # binary (GAL) weights may not store the weights values, which are 1.0
+    data = np.fromiter(chain.from_iterable(w if len(w) == len(nb) else (1.0,) * len(nb) for nb, w in zip(nbrs, wts)),
+                       dtype=np.float64, count=nnz)
+
+    for arr in (indptr, indices, data):
+        arr.flags.writeable = False
+    return indptr, indices, data
+
+def _sorted_member(keys, sorted_keys):
+    """Get a bool mask of the keys that are in the sorted array of keys
+    """
+    if len(sorted_keys) == 0:
+        return np.zeros(len(keys), dtype=bool)
+    pos = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+    return sorted_keys[pos] == keys
+
+def _csr_keys(csr, start, end, num_obs):
+    """Get the sorted keys (row * n + col) of the neighbors of rows [start, end), and their weights values
+    """
+    indptr, indices, data = csr
+    lo, hi = int(indptr[start]), int(indptr[end])
+    rows = np.repeat(np.arange(start, end, dtype=np.int64), np.diff(indptr[start:end + 1]))
+    keys = rows * num_obs + indices[lo:hi]
+    order = np.argsort(keys, kind='stable')
+    return keys[order], np.asarray(data[lo:hi])[order]
+
+def _weights_set_op(w, other, op, cpu_threads):
+    """Merge-join the sorted neighbors of two weights, row by row
+
+    Args:
+        w (Weight): The left weights, whose values are kept for the common neighbors
+        other (Weight): The right weights
+        op (str): "intersection", "union" or "difference"
+        cpu_threads (int): The number of cpu threads, the rows are split into chunks joined in parallel
 
     Returns:
-        Weight: An instance of Weight class 
+        Weight: An instance of Weight class
+    """
+    if not isinstance(other, Weight):
+        raise ValueError("The other weights has to be an instance of Weight class.")
+    if other.num_obs != w.num_obs:
+        raise ValueError("The weights have to be created for the same number of observations.")
+
+    num_obs = w.num_obs
+    left, right = w.to_csr(), other.to_csr()
+
+    def run(start, end):
+        a_keys, a_data = _csr_keys(left, start, end, num_obs)
+        b_keys, b_data = _csr_keys(right, start, end, num_obs)
+        in_b = _sorted_member(a_keys, b_keys)
+        if op == "intersection":
+            return a_keys[in_b], a_data[in_b]
+        if op == "difference":
+            return a_keys[~in_b], a_data[~in_b]
+        only_b = ~_sorted_member(b_keys, a_keys)
+        keys = np.concatenate([a_keys, b_keys[only_b]])
+        data = np.concatenate([a_data, b_data[only_b]])
+        order = np.argsort(keys, kind='stable')
+        return keys[order], data[order]
+
+    parts = map_chunks(run, num_obs, cpu_threads)
+    keys = np.concatenate([k for k, _ in parts]) if parts else np.zeros(0, dtype=np.int64)
+    data = np.concatenate([d for _, d in parts]) if parts else np.zeros(0, dtype=np.float64)
+
+    indptr = np.zeros(num_obs + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys // num_obs, minlength=num_obs), out=indptr[1:])
+    return Weight.from_csr(indptr, keys % num_obs, data)
+
+def _csr_lag(indptr, indices, data, x, standardize, start, end):
+    """Compute the spatial lags of the rows [start, end) of CSR weights for a (n x p) array
+
+    If data is None, every neighbor has the weight 1. scipy's sparse matrix product is used if scipy is installed, otherwise the
+    rows are summed with np.add.reduceat.
+    """
+    lo, hi = indptr[start], indptr[end]
+    row_ptr = indptr[start:end + 1] - lo
+    has_nbrs = np.diff(row_ptr) > 0
+    w = np.ones(hi - lo) if data is None else data[lo:hi]
+    if hi == lo:
+        return np.zeros((end - start, x.shape[1]))
+
+    # segment starts of the rows with neighbors, empty rows are skipped
+    seg_starts = row_ptr[:-1][has_nbrs]
+    try:
+        from scipy.sparse import csr_matrix
+        lags = csr_matrix((w, indices[lo:hi], row_ptr), shape=(end - start, x.shape[0])) @ x
+    except ImportError:
+        lags = np.zeros((end - start, x.shape[1]))
+        lags[has_nbrs] = np.add.reduceat(x[indices[lo:hi]] * w[:, None], seg_starts, axis=0)
+
+    if standardize:
+        w_sum = np.zeros(end - start)
+        w_sum[has_nbrs] = np.add.reduceat(w, seg_starts)
+        np.divide(lags, w_sum[:, None], out=lags, where=w_sum[:, None] != 0)
+    return lags
+
+def _csr_stats(indptr, indices, data):
+    """Compute the symmetry and neighbor statistics of CSR weights in one pass
+    """
+    num_obs = len(indptr) - 1
+    counts = np.diff(indptr)
+    nnz = len(indices)
+
+    rows = np.repeat(np.arange(num_obs, dtype=np.int64), counts)
+    cols = indices.astype(np.int64)
+    fwd = np.argsort(rows * num_obs + cols, kind='stable')
+    bwd = np.argsort(cols * num_obs + rows, kind='stable')
+    is_symmetric = bool(np.array_equal(rows[fwd], cols[bwd]) and np.array_equal(cols[fwd], rows[bwd]) and
+                        np.array_equal(data[fwd], data[bwd]))
+
+    return {
+        "is_symmetric": is_symmetric,
+        "sparsity": nnz / float(num_obs * num_obs),
+        "min_nbrs": int(counts.min()),
+        "max_nbrs": int(counts.max()),
+        "mean_nbrs": nnz / float(num_obs),
+        "median_nbrs": float(np.median(counts)),
+        "weight_type": GeoDaWeight.gal_type if np.all(data == 1) else GeoDaWeight.gwt_type,
+    }
+
+def _id_labels(num_obs):
+    """Get the 0-based ids as strings (an object array), to format the ids of a weights file by indexing
     """
+    return np.arange(num_obs).astype(str).astype(object)
 
-    f = open(file_path)
-    first_line = f.readline()
+def _write_gal(file_path, indptr, indices):
+    """Write binary CSR weights to a .gal file using the 0-based indices as ids
 
-    items = first_line.split(" ")
+    The tokens are looked up in an array of id strings and written with a single join,
+    without a Python loop over the observations.
+    """
+    num_obs = len(indptr) - 1
+    counts = np.diff(indptr).astype(np.int64)
+    rows = np.repeat(np.arange(num_obs, dtype=np.int64), counts)
+    labels = _id_labels(num_obs)
+
+    # "id count" lines; an observation without neighbors gets an empty neighbors line
+    heads = labels + " " + counts.astype(str).astype(object) + np.where(counts > 0, "\n", "\n\n").astype(object)
+    # the neighbors are separated by blanks, the last one of an observation ends the line
+    seps = np.full(len(indices), " ", dtype=object)
+    seps[np.asarray(indptr[1:], dtype=np.int64)[counts > 0] - 1] = "\n"
+
+    # the head of an observation, then its neighbors and separators
+    parts = np.empty(num_obs + 2 * len(indices), dtype=object)
+    nbr_pos = 2 * np.arange(len(indices), dtype=np.int64) + rows + 1
+    parts[2 * np.asarray(indptr[:-1], dtype=np.int64) + np.arange(num_obs)] = heads
+    parts[nbr_pos] = labels[indices]
+    parts[nbr_pos + 1] = seps
+    with open(file_path, 'w') as f:
+        f.write("0 {0} pygeoda id\n".format(num_obs))
+        f.write("".join(parts.tolist()))
+
+def _write_gwt(file_path, indptr, indices, data):
+    """Write CSR weights to a .gwt file using the 0-based indices as ids
+
+    The ids are looked up in an array of id strings, and the distinct weights are
+    formatted once (as float.__repr__, which round-trips), e.g. the two directions of
+    a symmetric distance. The lines are written with a single join.
+    """
+    num_obs = len(indptr) - 1
+    rows = np.repeat(np.arange(num_obs), np.diff(indptr))
+    labels = _id_labels(num_obs)
+    values, value_idx = np.unique(np.asarray(data, dtype=np.float64), return_inverse=True)
+    values = np.array(list(map(repr, values.tolist())), dtype=object)
+
+    lines = map(" ".join, zip(labels[rows].tolist(), labels[indices].tolist(), values[value_idx].tolist()))
+    with open(file_path, 'w') as f:
+        f.write("0 {0} pygeoda id\n".format(num_obs))
+        f.write("\n".join(lines))
+        f.write("\n")
+
+def _csr_to_gda_w(indptr, indices, data):
+    """Create a libgeoda GeoDaWeight object from CSR arrays
+
+    The weights are handed over as a GAL (binary weights, or data is None) or GWT
+    file, which libgeoda loads and summarizes in a single pass.
+    """
+    ids = [str(i) for i in range(len(indptr) - 1)]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if data is None or np.all(data == 1):
+            file_path = os.path.join(tmp_dir, "w.gal")
+            _write_gal(file_path, indptr, indices)
+            return gda_load_gal(file_path, ids)
+
+        file_path = os.path.join(tmp_dir, "w.gwt")
+        _write_gwt(file_path, indptr, indices, data)
+        return gda_load_gwt(file_path, ids)
+
+def _read_weights_file(file_path):
+    """Read a .gal or .gwt file in one pass, and get the number of observations and the body
+    """
+    if not os.path.exists(file_path):
+        raise ValueError("The weights file does not exist.")
 
+    with open(file_path, 'rb') as f:
+        content = f.read()
+
+    first_line, _, body = content.partition(b'\n')
+    items = first_line.split()
     if len(items) < 1:
         raise ValueError("The content of weights file is not correct.")
 
-    num_obs = int(items[1])
+    # e.g. "0 3085 natregimes POLY_ID" or "3085"
+    num_obs = int(items[1] if len(items) > 1 else items[0])
+    return num_obs, body, len(content)
+
+def _id_keys(id_vec, num_obs, geoda_obj=None):
+    """Get the id values as int64 (integer ids) or bytes, to match the ids in a .gal or .gwt file
+    """
+    if isinstance(id_vec, str):
+        if geoda_obj is None:
+            raise ValueError("The geoda_obj is required to read the id values from the column '{0}'.".format(id_vec))
+        id_vec = geoda_obj.column_array(id_vec)
 
-    if len(id_vec) != num_obs:
+    ids = np.asarray(id_vec)
+    if len(ids) != num_obs:
         raise ValueError("The id_vec size does not match the number of observations in weights file.")
 
-    gda_w = gda_load_gal(file_path, id_vec)
+    if ids.dtype.kind == 'f' and np.all(np.floor(ids) == ids):
+        ids = ids.astype(np.int64)
+    if ids.dtype.kind in 'iu':
+        ids = ids.astype(np.int64)
+    elif ids.dtype.kind != 'S':
+        ids = np.char.encode(ids.astype(str), 'utf-8')
 
-    return Weight(gda_w)
+    if len(np.unique(ids)) != num_obs:
+        raise ValueError("The values of id_vec have to be unique.")
+    return ids
 
-def read_gwt(file_path, id_vec):
-    """Read GWT Weights
-    Create a spatial weights object from a .GWT file
+def _ids_to_index(tokens, keys):
+    """Map the id tokens read from a weights file to the 0-based indices of the observations
+    """
+    if keys.dtype.kind == 'i':
+        try:
+            tokens = np.fromiter(map(int, tokens), dtype=np.int64, count=len(tokens))
+        except ValueError:
+            raise ValueError("The weights file contains id values that are not in id_vec.")
+        lo, hi = (int(keys.min()), int(keys.max())) if len(keys) > 0 else (0, -1)
+        if hi - lo < 4 * len(keys) + 1024:
+            # dense ids, e.g. 1..n: look up the indices directly
+            lookup = np.full(hi - lo + 1, -1, dtype=np.int64)
+            lookup[keys - lo] = np.arange(len(keys))
+            in_range = (tokens >= lo) & (tokens <= hi)
+            idx = np.where(in_range, lookup[np.clip(tokens - lo, 0, max(hi - lo, 0))], -1)
+            if np.any(idx < 0):
+                raise ValueError("The weights file contains id values that are not in id_vec.")
+            return idx
+    else:
+        tokens = np.asarray(tokens, dtype=keys.dtype if len(tokens) == 0 else None)
+    sorter = np.argsort(keys)
+    sorted_keys = keys[sorter]
+    pos = np.searchsorted(sorted_keys, tokens)
+    pos[pos >= len(keys)] = 0
+    if len(tokens) > 0 and not np.all(sorted_keys[pos] == tokens):
+        raise ValueError("The weights file contains id values that are not in id_vec.")
+    return sorter[pos]
+
+def _edges_to_weight(num_obs, rows, cols, data=None):
+    """Create a CSR-backed Weight from the (row, col, value) edges of the weights
+    """
+    order = np.argsort(rows, kind='stable')
+    indptr = np.zeros(num_obs + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_obs), out=indptr[1:])
+    return Weight.from_csr(indptr, cols[order], None if data is None else data[order])
+
+def _parse_gal(body, num_obs):
+    """Parse the body of a .gal file: "id count" lines, each followed by a line of neighbor ids
+    """
+    lines = body.splitlines()
+    while len(lines) > 2 * num_obs and not lines[-1].strip():
+        lines.pop()
+    if len(lines) == 2 * num_obs - 1:
+        # the last observation has no neighbors and no trailing line
+        lines.append(b'')
+
+    if len(lines) == 2 * num_obs:
+        head_tokens = b' '.join(lines[0::2]).split()
+        nbr_tokens = b' '.join(lines[1::2]).split()
+        if len(head_tokens) == 2 * num_obs:
+            counts = np.array(head_tokens[1::2]).astype(np.int64)
+            if counts.sum() == len(nbr_tokens):
+                return head_tokens[0::2], counts, nbr_tokens
+
+    # the neighbors are not one line per observation, walk through the tokens
+    tokens = body.split()
+    rec_ids, counts, nbr_tokens = [], [], []
+    pos = 0
+    for _ in range(num_obs):
+        if pos + 2 > len(tokens):
+            raise ValueError("The content of weights file is not correct.")
+        cnt = int(tokens[pos + 1])
+        rec_ids.append(tokens[pos])
+        counts.append(cnt)
+        nbr_tokens.extend(tokens[pos + 2:pos + 2 + cnt])
+        pos += 2 + cnt
+    return rec_ids, np.array(counts, dtype=np.int64), nbr_tokens
+
+def _report_throughput(file_path, num_bytes, num_edges, seconds):
+    logger.info("Read %s: %d neighbors, %.1f MB in %.3f s (%.1f MB/s)", os.path.basename(file_path), num_edges,
+                num_bytes / 1e6, seconds, num_bytes / 1e6 / max(seconds, 1e-9))
+
+def _file_gda_w_loader(load, file_path, keys):
+    """Get a function that loads a weights file with libgeoda (gda_load_gal or gda_load_gwt),
+    which returns None if the file has been changed since it was read
+    """
+    stat = os.stat(file_path)
+    ids = [k.decode('utf-8') if isinstance(k, bytes) else str(k) for k in keys.tolist()]
+
+    def load_file():
+        try:
+            changed = os.stat(file_path)
+        except OSError:
+            return None
+        if (changed.st_size, changed.st_mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+            return None
+        gda_w = load(file_path, ids)
+        return gda_w if gda_w is not None and gda_w.num_obs == len(ids) else None
+    return load_file
+
+def read_gal(file_path, id_vec, **kwargs):
+    """Read GAL Weights
+    Create a spatial weights object from a .GAL file. The file is read and parsed in one pass.
 
     Args:
         file_path (str): The file paht of the .GAL file
-        id_vec (tuple): The id values used in the .GAL file. e.g. [1,2,3,4,...]
+        id_vec (tuple, numpy.ndarray or str): The id values used in the .GAL file. e.g. [1,2,3,4,...],
+            or the name of the id column in geoda_obj
+        geoda_obj (geoda, optional): An instance of geoda class, used if id_vec is a column name
+        verbose (bool, optional): A bool flag indicates if the parse throughput is logged (INFO level of
+            the pygeoda.weights.weight logger). Defaults to False.
 
     Returns:
         Weight: An instance of Weight class 
     """
+    geoda_obj = None if 'geoda_obj' not in kwargs else kwargs['geoda_obj']
+    verbose = False if 'verbose' not in kwargs else kwargs['verbose']
 
-    f = open(file_path)
-    first_line = f.readline()
+    t_start = time.perf_counter()
+    num_obs, body, num_bytes = _read_weights_file(file_path)
+    keys = _id_keys(id_vec, num_obs, geoda_obj)
 
-    items = first_line.split(" ")
+    rec_ids, counts, nbr_tokens = _parse_gal(body, num_obs)
+    rows = np.repeat(_ids_to_index(rec_ids, keys), counts)
+    cols = _ids_to_index(nbr_tokens, keys)
+    w = _edges_to_weight(num_obs, rows, cols)
+    w._gda_w_loader = _file_gda_w_loader(gda_load_gal, file_path, keys)
 
-    if len(items) < 1:
-        raise ValueError("The content of weights file is not correct.")
+    if verbose:
+        _report_throughput(file_path, num_bytes, len(cols), time.perf_counter() - t_start)
+    return w
 
-    num_obs = int(items[1])
+def read_gwt(file_path, id_vec, **kwargs):
+    """Read GWT Weights
+    Create a spatial weights object from a .GWT file. The file is read and parsed in one pass.
 
-    if len(id_vec) != num_obs:
-        raise ValueError("The id_vec size does not match the number of observations in weights file.")
+    Args:
+        file_path (str): The file paht of the .GWT file
+        id_vec (tuple, numpy.ndarray or str): The id values used in the .GWT file. e.g. [1,2,3,4,...],
+            or the name of the id column in geoda_obj
+        geoda_obj (geoda, optional): An instance of geoda class, used if id_vec is a column name
+        verbose (bool, optional): A bool flag indicates if the parse throughput is logged (INFO level of
+            the pygeoda.weights.weight logger). Defaults to False.
 
-    gda_w = gda_load_gwt(file_path, id_vec)
+    Returns:
+        Weight: An instance of Weight class 
+    """
+    geoda_obj = None if 'geoda_obj' not in kwargs else kwargs['geoda_obj']
+    verbose = False if 'verbose' not in kwargs else kwargs['verbose']
 
-    return Weight(gda_w)
+    t_start = time.perf_counter()
+    num_obs, body, num_bytes = _read_weights_file(file_path)
+    keys = _id_keys(id_vec, num_obs, geoda_obj)
+
+    # "id nbr_id weight" lines
+    tokens = body.split()
+    if len(tokens) % 3 != 0:
+        raise ValueError("The content of weights file is not correct.")
+    rows = _ids_to_index(tokens[0::3], keys)
+    cols = _ids_to_index(tokens[1::3], keys)
+    data = np.fromiter(map(float, tokens[2::3]), dtype=np.float64, count=len(tokens) // 3)
+    w = _edges_to_weight(num_obs, rows, cols, data)
+    w._gda_w_loader = _file_gda_w_loader(gda_load_gwt, file_path, keys)
+
+    if verbose:
+        _report_throughput(file_path, num_bytes, len(cols), time.perf_counter() - t_start)
+    return w
 
 def read_swm(file_path, **kwargs):
     """Read SWM Weights
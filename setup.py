@@ -209,9 +209,10 @@ setup (name = 'pygeoda',
        author_email = "lixun910@gmail.com",
        url = "https://github.com/geodacenter/pygeoda",
        description = """pygeoda is a python library for spatial data analysis based on GeoDa and libgeoda.""",
+       install_requires = ['numpy'],
        ext_modules = extensions,
        package_data = package_data,
        include_package_data = include_package_data,
-       packages=['pygeoda','pygeoda.weights','pygeoda.sa','pygeoda.clustering', 'pygeoda.classify', 'pygeoda.data']
+       packages=['pygeoda','pygeoda.weights','pygeoda.sa','pygeoda.clustering', 'pygeoda.classify', 'pygeoda.data', 'pygeoda.io']
       )
 
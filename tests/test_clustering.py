@@ -104,6 +104,15 @@ class TestSpatialClustering(unittest.TestCase):
         self.assertAlmostEqual(
             clusters["The ratio of between to total sum of squares"], 0.3763086809)
 
+    def test_clusters_to_arrow(self):
+        import pyarrow
+        clusters = pygeoda.skater(5, self.queen_w, self.data)
+
+        tbl = pyarrow.table(clusters)
+        self.assertEqual(tbl.column_names, ["Clusters"])
+        self.assertEqual(tbl.column("Clusters").to_pylist(), list(clusters["Clusters"]))
+        self.assertEqual(dict(clusters)["Total sum of squares"], clusters["Total sum of squares"])
+
     def test_REDCAP_firstsingle(self):
         k = 5
         clusters = pygeoda.redcap(
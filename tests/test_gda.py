@@ -0,0 +1,250 @@
+import os
+import tempfile
+import unittest
+import numpy
+import pygeoda
+
+__author__ = "Xun Li <lixun910@gmail.com>, "
+
+class TestGeoda(unittest.TestCase):
+    def setUp(self):
+        self.guerry = pygeoda.open("./data/Guerry.shp")
+
+    def test_column_array(self):
+        pop = self.guerry.column_array("Pop1831")
+        self.assertEqual(pop.dtype.name, "float64")
+        self.assertEqual(len(pop), 85)
+        self.assertEqual(pop.tolist(), list(self.guerry.GetRealCol("Pop1831")))
+
+        # libgeoda reads the DBF N(18,0) field as a real column
+        crm_prs = self.guerry.column_array("Crm_prs")
+        self.assertEqual(crm_prs.dtype.name, "float64")
+        self.assertEqual(crm_prs[0], 28870)
+
+        code_de = self.guerry.column_array("CODE_DE")
+        self.assertEqual(len(code_de), 85)
+
+    def test_null_mask(self):
+        undefs = self.guerry.null_mask("Crm_prs")
+        self.assertEqual(undefs.dtype.name, "bool")
+        self.assertEqual(len(undefs), 85)
+        self.assertFalse(undefs.any())
+
+    def test_null_column(self):
+        import geopandas
+        import shapely
+        gdf = geopandas.GeoDataFrame({"r": [1.5, None, 3.0], "s": ["a", None, "c"]},
+                                     geometry=[shapely.box(i, 0, i + 1, 1) for i in range(3)], crs="EPSG:4326")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            ds_path = os.path.join(tmp_dir, "nulls.shp")
+            gdf.to_file(ds_path)
+
+            # libgeoda skips the undefined cells: they are put back with the flags of the DBF file
+            for gda in (pygeoda.open(ds_path), pygeoda.open(ds_path, columns=["s", "r"])):
+                self.assertEqual(gda.column_array("r").tolist(), [1.5, 0.0, 3.0])
+                self.assertEqual(gda.null_mask("r").tolist(), [False, True, False])
+                self.assertEqual(list(gda.GetRealCol("r")), [1.5, 0.0, 3.0])
+                self.assertEqual(list(gda.GetUndefinedVals("r")), [False, True, False])
+                self.assertEqual(gda.column_array("s").tolist(), ["a", "", "c"])
+                self.assertEqual(gda.null_mask("s").tolist(), [False, True, False])
+
+    def test_geopandas_table_columns(self):
+        import geopandas
+        import pandas
+        import shapely
+        from pygeoda.gda import geopandas_to_geoda
+        gdf = geopandas.GeoDataFrame({
+            "r": [1.5, numpy.nan, 3.0],
+            "n": [1, 2, 3],
+            "i": pandas.array([1, None, 3], dtype="Int64"),
+            "s": pandas.Series(["a", None, "c"], dtype=object),
+            "b": [True, False, True],
+            "bn": pandas.array([True, None, False], dtype="boolean"),
+        }, geometry=[shapely.box(i, 0, i + 1, 1) for i in range(3)])
+        gda = geopandas_to_geoda(gdf, with_table=True)
+
+        self.assertEqual(gda.field_types, {"r": "real", "n": "integer", "i": "integer", "s": "string",
+                                           "b": "integer", "bn": "integer"})
+        self.assertEqual(gda.column_array("r").tolist(), [1.5, 0.0, 3.0])
+        self.assertEqual(gda.column_array("n").tolist(), [1, 2, 3])
+        self.assertEqual(gda.column_array("i").tolist(), [1, 0, 3])
+        self.assertEqual(gda.column_array("s").tolist(), ["a", "", "c"])
+        self.assertEqual(list(gda.GetIntegerCol("b")), [1, 0, 1])
+        self.assertEqual(list(gda.GetIntegerCol("bn")), [1, 0, 0])
+
+        nulls = {"r": True, "n": False, "i": True, "s": True, "b": False, "bn": True}
+        for nm, has_null in nulls.items():
+            self.assertEqual(gda.null_mask(nm).tolist(), [False, has_null, False])
+            self.assertEqual(list(gda.GetUndefinedVals(nm)), [False, has_null, False])
+
+    def test_null_column_lazy(self):
+        import geopandas
+        import shapely
+        gdf = geopandas.GeoDataFrame({"r": [1.5, None, 3.0], "i": [1, None, 3], "s": ["a", None, "c"]},
+                                     geometry=[shapely.box(i, 0, i + 1, 1) for i in range(3)], crs="EPSG:4326")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            ds_path = os.path.join(tmp_dir, "nulls.shp")
+            gdf.to_file(ds_path)
+
+            # both backends return the same values and undefined flags
+            gda, lazy = pygeoda.open(ds_path), pygeoda.open(ds_path, lazy=True)
+            for nm in ("r", "i", "s"):
+                self.assertEqual(lazy.field_types[nm], gda.field_types[nm])
+                self.assertEqual(lazy[nm], gda[nm])
+                self.assertEqual(lazy.column_array(nm).tolist(), gda.column_array(nm).tolist())
+                self.assertEqual(lazy.null_mask(nm).tolist(), [False, True, False])
+                self.assertEqual(lazy.null_mask(nm).tolist(), gda.null_mask(nm).tolist())
+                self.assertEqual(list(lazy.GetUndefinedVals(nm)), list(gda.GetUndefinedVals(nm)))
+            self.assertEqual(list(lazy.GetRealCol("r")), [1.5, 0.0, 3.0])
+            self.assertEqual(list(lazy.GetRealCol("r")), list(gda.GetRealCol("r")))
+            self.assertEqual(list(lazy.GetIntegerCol("i")), list(gda.GetIntegerCol("i")))
+            self.assertEqual(list(lazy.GetStringCol("s")), list(gda.GetStringCol("s")))
+
+    def test_to_arrow_nulls(self):
+        import geopandas
+        import pyarrow
+        import shapely
+        gdf = geopandas.GeoDataFrame({"r": [1.5, None, 3.0], "s": ["a", None, "c"]},
+                                     geometry=[shapely.box(i, 0, i + 1, 1) for i in range(3)], crs="EPSG:4326")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            ds_path = os.path.join(tmp_dir, "nulls.shp")
+            gdf.to_file(ds_path)
+
+            for gda in (pygeoda.open(ds_path), pygeoda.open(ds_path, lazy=True), pygeoda.open(gdf)):
+                tbl = gda.to_arrow(["r", "s"])
+                self.assertEqual(tbl.column("r").to_pylist(), [1.5, None, 3.0])
+                self.assertEqual(tbl.column("s").to_pylist(), ["a", None, "c"])
+                # through the Arrow C stream interface
+                self.assertEqual(pyarrow.table(gda).column("r").null_count, 1)
+
+    def test_invalid_column(self):
+        with self.assertRaises(ValueError):
+            self.guerry.column_array("not_a_column")
+
+    def test_column_cache(self):
+        self.guerry.set_cache_size(1024 * 1024)
+        a = self.guerry.column_array("Pop1831")
+        b = self.guerry.column_array("Pop1831")
+        self.assertTrue(a is b)
+        self.assertFalse(a.flags.writeable)
+
+        self.guerry.invalidate_cache()
+        c = self.guerry.column_array("Pop1831")
+        self.assertFalse(a is c)
+        self.assertEqual(a.tolist(), c.tolist())
+
+        self.guerry.set_cache_size(0)
+        self.assertFalse(self.guerry.column_array("Pop1831") is self.guerry.column_array("Pop1831"))
+
+    def test_open_with_columns_and_filters(self):
+        gda = pygeoda.open("./data/Guerry.shp", columns=["CODE_DE", "Crm_prs"])
+        self.assertEqual(gda.num_obs, 85)
+        self.assertEqual(list(gda.field_names), ["CODE_DE", "Crm_prs"])
+
+        gda = pygeoda.open("./data/Guerry.shp", columns=["Crm_prs"], where=lambda t: t["Crm_prs"] > 20000)
+        self.assertEqual(gda.num_obs, 37)
+        self.assertTrue(min(gda.GetIntegerCol("Crm_prs")) > 20000)
+
+    def test_open_invalid_options(self):
+        import geopandas
+        with self.assertRaises(TypeError):
+            pygeoda.open("./data/Guerry.shp", column=["Crm_prs"])
+        with self.assertRaises(TypeError):
+            pygeoda.open("./data/Guerry.shp", ["Crm_prs"])
+        with self.assertRaises(ValueError):
+            pygeoda.open(geopandas.read_file("./data/columbus.shp"), columns=["hoval"])
+
+    def test_open_lazy(self):
+        gda = pygeoda.open("./data/Guerry.shp", lazy=True)
+        self.assertEqual(gda.num_obs, 85)
+        self.assertEqual(gda.field_names, self.guerry.field_names)
+        self.assertEqual(gda.field_types, self.guerry.field_types)
+        self.assertEqual(gda.column_array("Crm_prs").dtype, numpy.float64)
+        self.assertEqual(gda.column_array("Pop1831").tolist(), self.guerry.column_array("Pop1831").tolist())
+        self.assertEqual(gda["Crm_prs"], self.guerry["Crm_prs"])
+
+        w = pygeoda.queen_weights(gda)
+        self.assertEqual(w.num_obs, 85)
+
+    def test_to_arrow(self):
+        tbl = self.guerry.to_arrow(["Crm_prs", "Pop1831", "CODE_DE"])
+        self.assertEqual(tbl.num_rows, 85)
+        self.assertEqual(tbl.column_names, ["Crm_prs", "Pop1831", "CODE_DE"])
+        self.assertEqual(str(tbl.schema.field("Crm_prs").type), "double")
+        self.assertEqual(tbl.column("Crm_prs").null_count, 0)
+        self.assertEqual(tbl.column("Pop1831").to_pylist(), list(self.guerry.GetRealCol("Pop1831")))
+
+        self.assertEqual(self.guerry.to_arrow().num_columns, self.guerry.num_cols)
+
+    def test_open_arrow(self):
+        import geopandas
+        gdf = geopandas.read_file("./data/Guerry.shp")
+        w = pygeoda.queen_weights(self.guerry)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for nm in ("Guerry.parquet", "Guerry.feather"):
+                ds_path = os.path.join(tmp_dir, nm)
+                if nm.endswith(".parquet"):
+                    gdf.to_parquet(ds_path)
+                else:
+                    gdf.to_feather(ds_path)
+
+                gda = pygeoda.open(ds_path)
+                self.assertEqual(gda.num_obs, 85)
+                self.assertEqual(list(gda.GetRealCol("Pop1831")), list(self.guerry.GetRealCol("Pop1831")))
+                self.assertEqual(list(gda.GetStringCol("Region")), list(self.guerry.GetStringCol("Region")))
+
+                w2 = pygeoda.queen_weights(gda)
+                self.assertEqual(w2.mean_neighbors(), w.mean_neighbors())
+                self.assertEqual(w2.max_neighbors(), w.max_neighbors())
+
+    def test_open_points_with_bbox(self):
+        import geopandas
+        import shapely
+        gdf = geopandas.GeoDataFrame({"v": [1, 2, 3]}, geometry=[shapely.Point(0, 1), shapely.Point(2, 3), shapely.Point(4, 5)])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            ds_path = os.path.join(tmp_dir, "points.shp")
+            gdf.to_file(ds_path)
+
+            gda = pygeoda.open(ds_path, lazy=True)
+            self.assertEqual(gda.reader.bounds()[1].tolist(), [[0, 1, 0, 1], [2, 3, 2, 3], [4, 5, 4, 5]])
+
+            gda = pygeoda.open(ds_path, bbox=(1, 2, 5, 6))
+            self.assertEqual(gda.num_obs, 2)
+            self.assertEqual([float(v) for v in gda["v"]], [2.0, 3.0])
+
+    def test_open_geopandas_lazy(self):
+        import geopandas
+        from unittest import mock
+        from pygeoda import gda as gda_module
+        gdf = geopandas.read_file("./data/columbus.shp")
+
+        with mock.patch.object(gda_module, "geopandas_to_geoda", wraps=gda_module.geopandas_to_geoda) as convert:
+            gda = pygeoda.open(gdf)
+            self.assertEqual(gda.num_obs, 49)
+            self.assertEqual(gda.column_array("hoval").tolist(), gdf["hoval"].tolist())
+            gda.fingerprint()
+            self.assertIsNone(gda._gp)
+            convert.assert_not_called()
+
+            w = pygeoda.queen_weights(gda)
+            self.assertIs(gda.gp, gda.gp)
+            self.assertIs(gda.gda, gda.gp.gda)
+            self.assertEqual(w.num_obs, 49)
+            convert.assert_called_once_with(gdf)
+
+    def test_geoda_to_geopandas(self):
+        import geopandas
+        import pyarrow
+        import shapely
+        gdf = geopandas.read_file("./data/Guerry.shp")
+
+        for gda in (self.guerry, pygeoda.open("./data/Guerry.shp", lazy=True), pygeoda.open(pyarrow.table(gdf.to_arrow()))):
+            gdf2 = pygeoda.gda.geoda_to_geopandas(gda)
+            self.assertEqual(len(gdf2), 85)
+            self.assertTrue(shapely.equals_exact(numpy.asarray(gdf2.geometry), numpy.asarray(gdf.geometry), 0).all())
+            self.assertEqual(gdf2["Pop1831"].tolist(), gdf["Pop1831"].tolist())
+            self.assertEqual(gdf2["Region"].tolist(), gdf["Region"].tolist())
+
+        # the round trip creates the same weights
+        w = pygeoda.queen_weights(pygeoda.open(pygeoda.gda.geoda_to_geopandas(self.guerry)))
+        self.assertEqual(w.mean_neighbors(), pygeoda.queen_weights(self.guerry).mean_neighbors())
@@ -14,6 +14,18 @@ class TestLISA(unittest.TestCase):
         slect_vars = ['Crm_prp','Crm_prs']
         self.data = [self.guerry.GetRealCol(v) for v in slect_vars]
 
+    def test_local_moran_csr_gwt(self):
+        # the inverse distance weights go to libgeoda as a GWT file
+        w = pygeoda.knn_weights(self.guerry, 6, is_inverse=True)
+        w2 = pygeoda.Weight.from_csr(*w.to_csr())
+        lm = pygeoda.local_moran(w, self.data[0])
+        lm2 = pygeoda.local_moran(w2, self.data[0])
+
+        self.assertEqual(w2.gda_w.num_obs, 85)
+        for a, b in zip(lm.lisa_values(), lm2.lisa_values()):
+            self.assertAlmostEqual(a, b)
+        self.assertEqual(lm.lisa_clusters(), lm2.lisa_clusters())
+
     def test_batch_moran(self):
         blm = pygeoda.batch_local_moran(self.queen_w, self.data)
 
@@ -61,6 +73,19 @@ class TestLISA(unittest.TestCase):
         pvals = lisa.lisa_pvalues()
         self.assertAlmostEqual(pvals[11], 0.244)
 
+    def test_lisa_to_arrow(self):
+        lisa = pygeoda.local_moran(self.queen_w, self.crm_prp, permutation_method="complete")
+
+        tbl = lisa.to_arrow()
+        self.assertEqual(tbl.num_rows, 85)
+        self.assertEqual(tbl.column_names, ["lisa_values", "lisa_pvalues", "lisa_clusters", "lisa_num_nbrs"])
+        self.assertEqual(tbl.column("lisa_values").to_pylist(), list(lisa.lisa_values()))
+        self.assertEqual(tbl.column("lisa_clusters").to_pylist(), list(lisa.lisa_clusters()))
+
+        # pyarrow reads the results through the Arrow C stream interface
+        import pyarrow
+        self.assertEqual(pyarrow.table(lisa).column("lisa_pvalues").to_pylist(), list(lisa.lisa_pvalues()))
+
     def test_local_moran(self):
         lisa = pygeoda.local_moran(self.queen_w, self.crm_prp, permutation_method="complete")
 
@@ -1,4 +1,7 @@
+import os
+import tempfile
 import unittest
+import numpy
 import pygeoda
 
 __author__ = "Xun Li <lixun910@gmail.com>, "
@@ -18,6 +21,222 @@ class TestWeights(unittest.TestCase):
         self.assertTrue(w.is_symmetric())
         self.assertAlmostEqual(w.weights_sparsity(), 0.0019089598070866245)
 
+    def test_weights_to_csr(self):
+        w = pygeoda.queen_weights(self.nat)
+        indptr, indices, data = w.to_csr()
+
+        self.assertEqual(len(indptr), 3086)
+        self.assertEqual(indptr[-1], 18168)
+        self.assertEqual(indices[indptr[0]:indptr[1]].tolist(), list(w.get_neighbors(0)))
+        self.assertEqual(data.sum(), 18168)
+
+    def test_weights_from_csr(self):
+        w = pygeoda.queen_weights(self.nat)
+        w2 = pygeoda.Weight.from_csr(*w.to_csr())
+
+        self.assertEqual(w2.num_obs, 3085)
+        self.assertEqual(w2.min_neighbors(), 1)
+        self.assertEqual(w2.mean_neighbors(), 5.8891410048622364)
+        self.assertEqual(w2.max_neighbors(), 14)
+        self.assertTrue(w2.is_symmetric())
+        self.assertAlmostEqual(w2.weights_sparsity(), 0.0019089598070866245)
+        self.assertEqual(w2.get_neighbors(0), w.get_neighbors(0))
+
+        self.assertEqual(w2.gda_w.num_obs, 3085)
+        self.assertEqual(w2.gda_w.max_nbrs, 14)
+
+        with self.assertRaises(ValueError):
+            pygeoda.Weight.from_csr([0, 1], [2])
+
+    def test_weights_sparse(self):
+        w = pygeoda.knn_weights(self.nat, 6, is_inverse=True)
+        m = w.to_csr(sparse=True)
+
+        self.assertEqual(m.shape, (3085, 3085))
+        self.assertEqual(m.nnz, 3085 * 6)
+        for i in range(0, 3085, 100):
+            row = m.getrow(i)
+            self.assertEqual(row.indices.tolist(), list(w.get_neighbors(i)))
+            self.assertEqual(row.data.tolist(), list(w.get_neighbors_weights(i)))
+
+        w2 = pygeoda.Weight.from_sparse(m)
+        self.assertEqual(w2.num_obs, 3085)
+        for i in range(0, 3085, 100):
+            self.assertEqual(w2.get_neighbors(i), w.get_neighbors(i))
+            self.assertEqual(w2.get_neighbors_weights(i), w.get_neighbors_weights(i))
+        self.assertEqual((w2.to_csr(sparse=True) != m).nnz, 0)
+
+        # the libgeoda weights of w2 are loaded from its CSR arrays
+        self.assertEqual(w2.gda_w.GetNeighborWeights(0), w.get_neighbors_weights(0))
+
+        with self.assertRaises(ValueError):
+            pygeoda.Weight.from_sparse(m[:, :10])
+
+    def test_spatial_lag(self):
+        w = pygeoda.queen_weights(self.nat)
+        hr60 = self.nat.GetRealCol("HR60")
+        hr70 = self.nat.GetRealCol("HR70")
+
+        lags = w.spatial_lag(hr60)
+        self.assertEqual(len(lags), 3085)
+        nbrs = w.get_neighbors(0)
+        self.assertAlmostEqual(lags[0], sum(hr60[j] for j in nbrs) / len(nbrs))
+
+        x = numpy.column_stack([self.nat.column_array("HR60"), self.nat.column_array("HR70")])
+        lags2 = w.spatial_lag(x, cpu_threads=2)
+        self.assertEqual(lags2.shape, (3085, 2))
+        self.assertAlmostEqual(lags2[0, 0], lags[0])
+        self.assertAlmostEqual(lags2[0, 1], w.spatial_lag(hr70)[0])
+
+    def test_spatial_lag_gwt(self):
+        w = pygeoda.knn_weights(self.nat, 4, is_inverse=True)
+        hr60 = self.nat.GetRealCol("HR60")
+        indptr, indices, data = w.to_csr()
+        nbrs, wts = indices[indptr[0]:indptr[1]], data[indptr[0]:indptr[1]]
+
+        # the default lag is the average of the neighboring values, as gda_w.SpatialLag()
+        lags = w.spatial_lag(hr60)
+        self.assertAlmostEqual(lags[0], sum(hr60[j] for j in nbrs) / len(nbrs))
+        self.assertAlmostEqual(lags[0], w.gda_w.SpatialLag(0, hr60))
+
+        lags = w.spatial_lag(hr60, use_weights=True)
+        self.assertAlmostEqual(lags[0], sum(hr60[j] * v for j, v in zip(nbrs, wts)) / wts.sum())
+        lags = w.spatial_lag(hr60, use_weights=True, standardize=False)
+        self.assertAlmostEqual(lags[0], sum(hr60[j] * v for j, v in zip(nbrs, wts)))
+
+    def test_gwb_weights(self):
+        w = pygeoda.queen_weights(self.nat)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            out_path = os.path.join(tmp_dir, "natregimes.gwb")
+            w.save_weights(out_path, "natregimes", "POLY_ID", self.poly_id)
+
+            w2, ids = pygeoda.read_gwb(out_path, with_ids=True)
+            self.assertEqual(w2.num_obs, 3085)
+            self.assertEqual(w2.mean_neighbors(), w.mean_neighbors())
+            self.assertTrue(w2.is_symmetric())
+            self.assertEqual(w2.get_neighbors(0), w.get_neighbors(0))
+            # the values of binary weights are created when they are needed
+            self.assertIsNone(w2._csr[2])
+            self.assertEqual(w2.gda_w.max_nbrs, 14)
+            self.assertEqual(w2.to_csr()[2].tolist(), [1.0] * 18168)
+            self.assertEqual(ids.tolist(), list(self.poly_id))
+            del w2, ids
+
+    def test_csr_to_gda_w(self):
+        # observation 1 is an isolate: its neighbors line of the GAL file is empty
+        indptr, indices = [0, 2, 2, 3, 5], [1, 3, 0, 0, 2]
+        for data in (None, [0.5, 1 / 3.0, 2.0, 1e-7, 1e16]):
+            w = pygeoda.Weight.from_csr(indptr, indices, data)
+            gda_w = w.gda_w
+            self.assertEqual(gda_w.num_obs, 4)
+            self.assertTrue(gda_w.HasIsolates())
+            _, _, values = w.to_csr()
+            for i in range(4):
+                self.assertEqual(list(gda_w.GetNeighbors(i)), list(w.get_neighbors(i)))
+                self.assertEqual(list(gda_w.GetNeighborWeights(i)), values[indptr[i]:indptr[i + 1]].tolist())
+
+    def test_read_gal_gwt(self):
+        w = pygeoda.queen_weights(self.nat)
+        knn = pygeoda.knn_weights(self.nat, 4)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            gal_path = os.path.join(tmp_dir, "natregimes.gal")
+            w.save_weights(gal_path, "natregimes", "POLY_ID", self.poly_id)
+            w2 = pygeoda.read_gal(gal_path, numpy.array(self.poly_id))
+            self.assertEqual(w2.num_obs, 3085)
+            self.assertEqual(w2.mean_neighbors(), w.mean_neighbors())
+            self.assertEqual(sorted(w2.get_neighbors(0)), sorted(w.get_neighbors(0)))
+
+            gwt_path = os.path.join(tmp_dir, "natregimes.gwt")
+            knn.save_weights(gwt_path, "natregimes", "POLY_ID", self.poly_id)
+            with self.assertLogs("pygeoda.weights.weight", "INFO"):
+                knn2 = pygeoda.read_gwt(gwt_path, "POLY_ID", geoda_obj=self.nat, verbose=True)
+            self.assertEqual(knn2.num_obs, 3085)
+            self.assertEqual(knn2.max_neighbors(), 4)
+            self.assertAlmostEqual(knn2.weights_sparsity(), 0.0012965964343598055)
+
+            # libgeoda loads the GeoDaWeight object from the file, unless the file has changed
+            self.assertEqual(knn2.gda_w.max_nbrs, 4)
+            self.assertIsNone(knn2._gda_w_loader)
+            w3 = pygeoda.read_gal(gal_path, numpy.array(self.poly_id))
+            knn.save_weights(gal_path, "natregimes", "POLY_ID", self.poly_id)
+            os.utime(gal_path, ns=(0, 0))
+            self.assertEqual(w3.gda_w.max_nbrs, w.max_neighbors())
+            self.assertTrue(w3.gda_w.is_symmetric)
+
+    def test_weights_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            pygeoda.set_weights_cache(cache_dir)
+            try:
+                w = pygeoda.queen_weights(self.nat)
+                self.assertEqual(len(os.listdir(cache_dir)), 1)
+                w2 = pygeoda.queen_weights(self.nat)
+                self.assertEqual(w2.mean_neighbors(), w.mean_neighbors())
+                self.assertEqual(w2.get_neighbors(0), w.get_neighbors(0))
+
+                pygeoda.knn_weights(self.nat, 4)
+                self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+                pygeoda.get_weights_cache().clear()
+                self.assertEqual(len(os.listdir(cache_dir)), 0)
+            finally:
+                pygeoda.set_weights_cache(None)
+
+    def test_queen_weights_threads(self):
+        w = pygeoda.queen_weights(self.nat)
+        w1 = pygeoda.queen_weights(self.nat, cpu_threads=1)
+        w4 = pygeoda.queen_weights(self.nat, cpu_threads=4)
+
+        self.assertEqual(w4.mean_neighbors(), w.mean_neighbors())
+        self.assertEqual(w4.max_neighbors(), 14)
+        self.assertTrue(w4.is_symmetric())
+        for i in range(10):
+            self.assertEqual(list(w4.get_neighbors(i)), sorted(w.get_neighbors(i)))
+        for a, b in zip(w1.to_csr(), w4.to_csr()):
+            self.assertEqual(a.tolist(), b.tolist())
+
+    def test_rook_weights_threads(self):
+        w1 = pygeoda.rook_weights(self.nat, cpu_threads=1)
+        w4 = pygeoda.rook_weights(self.nat, cpu_threads=4)
+
+        self.assertTrue(w4.is_symmetric())
+        self.assertEqual(w4.max_neighbors(), 13)
+        for a, b in zip(w1.to_csr(), w4.to_csr()):
+            self.assertEqual(a.tolist(), b.tolist())
+
+    def test_queen_weights_geopandas(self):
+        import geopandas
+        gdf = geopandas.read_file("./data/columbus.shp")
+        gda = pygeoda.open(gdf)
+        w = pygeoda.queen_weights(gda)
+
+        self.assertEqual(w.num_obs, 49)
+        self.assertAlmostEqual(w.mean_neighbors(), 4.816, places=3)
+        self.assertTrue(w.is_symmetric())
+
+    def test_queen_weights_higher_order(self):
+        w2 = pygeoda.queen_weights(self.nat, order=2, include_lower_order=True, cpu_threads=2)
+        w3 = pygeoda.queen_weights(self.nat, order=3, cpu_threads=2)
+
+        self.assertEqual(len(self.nat._contiguity), 1)
+        self.assertEqual(w2.mean_neighbors(), 18.440194489465153)
+        self.assertEqual(w2.max_neighbors(), 40)
+        self.assertTrue(w2.is_symmetric())
+        self.assertTrue(w3.is_symmetric())
+        for i in range(0, 3085, 100):
+            self.assertFalse(set(w2.get_neighbors(i)) & set(w3.get_neighbors(i)))
+
+    def test_queen_weights_higher_order_cached(self):
+        gda = pygeoda.open("./data/natregimes.shp")
+        w_native = pygeoda.queen_weights(gda, order=3, include_lower_order=True)
+        self.assertEqual(len(gda._contiguity), 0)
+
+        pygeoda.queen_weights(gda)
+        w_expanded = pygeoda.queen_weights(gda, order=3, include_lower_order=True)
+        self.assertEqual(len(gda._contiguity), 1)
+        self.assertEqual(w_expanded.mean_neighbors(), w_native.mean_neighbors())
+        for i in range(0, 3085, 50):
+            self.assertEqual(sorted(w_expanded.get_neighbors(i)), sorted(w_native.get_neighbors(i)))
+
     def test_queen2_weight(self):
 
         w = pygeoda.queen_weights(self.nat,order = 2, include_lower_order = True, precision_threshold = 1.0)
@@ -60,6 +279,161 @@ class TestWeights(unittest.TestCase):
         self.assertFalse(w.is_symmetric())
         self.assertAlmostEqual(w.weights_sparsity(), 0.0012965964343598055)
 
+    def test_knn_weights_threads(self):
+        w = pygeoda.knn_weights(self.nat, 4, power=2.0)
+        w2 = pygeoda.knn_weights(self.nat, 4, power=2.0, cpu_threads=3)
+
+        self.assertEqual(w2.num_obs, 3085)
+        self.assertEqual(w2.max_neighbors(), 4)
+        self.assertFalse(w2.is_symmetric())
+        for a, b in zip(w.to_csr(), w2.to_csr()):
+            self.assertEqual(a.tolist(), b.tolist())
+
+    def test_spatial_index_weights(self):
+        w = pygeoda.knn_weights(self.nat, 4, use_index=True)
+
+        self.assertEqual(w.num_obs, 3085)
+        self.assertEqual(w.min_neighbors(), 4)
+        self.assertEqual(w.max_neighbors(), 4)
+        self.assertAlmostEqual(w.weights_sparsity(), 0.0012965964343598055)
+        self.assertIs(self.nat.spatial_index(), self.nat.spatial_index(is_mile=False))
+
+        dist_thres = pygeoda.min_distthreshold(self.nat, use_index=True)
+        self.assertEqual(dist_thres, pygeoda.min_distthreshold(self.nat))
+
+        w = pygeoda.distance_weights(self.nat, dist_thres, use_index=True)
+        self.assertEqual(w.min_neighbors(), 1)
+        self.assertEqual(w.max_neighbors(), 85)
+        self.assertTrue(w.is_symmetric())
+        self.assertAlmostEqual(w.mean_neighbors(), 36.8337, places=2)
+
+    def test_spatial_index_min_distthreshold(self):
+        for path in ("./data/natregimes.shp", "./data/chicago_comm.shp", "./data/Guerry.shp"):
+            gda = pygeoda.open(path)
+            for is_arc in (False, True):
+                dist_thres = pygeoda.min_distthreshold(gda, is_arc=is_arc)
+
+                # the index finds the same neighbors as libgeoda
+                w = pygeoda.distance_weights(gda, dist_thres, is_arc=is_arc)
+                w2 = pygeoda.distance_weights(gda, dist_thres, is_arc=is_arc, use_index=True)
+                k = pygeoda.knn_weights(gda, 6, is_arc=is_arc)
+                k2 = pygeoda.knn_weights(gda, 6, is_arc=is_arc, use_index=True)
+                for i in range(gda.num_obs):
+                    self.assertEqual(list(w2.get_neighbors(i)), sorted(w.get_neighbors(i)))
+                    self.assertEqual(sorted(k2.get_neighbors(i)), sorted(k.get_neighbors(i)))
+
+    def test_spatial_index_geopandas(self):
+        import geopandas
+        gda = pygeoda.open("./data/Guerry.shp")
+        gda2 = pygeoda.open(geopandas.read_file("./data/Guerry.shp"))
+
+        # the centroids of a GeoDataFrame are the ones of libgeoda too
+        self.assertEqual(gda2.spatial_index().points.tolist(), gda.spatial_index().points.tolist())
+        self.assertEqual(pygeoda.min_distthreshold(gda2, use_index=True), pygeoda.min_distthreshold(gda))
+
+    def test_spatial_index_arc_weights(self):
+        w = pygeoda.knn_weights(self.nat, 6, is_arc=True, is_mile=False, use_index=True)
+
+        self.assertEqual(w.num_obs, 3085)
+        self.assertEqual(w.min_neighbors(), 6)
+        self.assertEqual(w.max_neighbors(), 6)
+        self.assertAlmostEqual(w.weights_sparsity(), 0.0019448946515397084)
+
+        dist_km = pygeoda.min_distthreshold(self.nat, is_arc=True, is_mile=False, use_index=True)
+        dist_mi = pygeoda.min_distthreshold(self.nat, is_arc=True, is_mile=True, use_index=True)
+        self.assertAlmostEqual(dist_km / dist_mi, 1.609344)
+        self.assertIsNot(self.nat.spatial_index(is_arc=True), self.nat.spatial_index(is_arc=True, is_mile=False))
+
+        # the arc threshold of libgeoda leaves an isolate in its own weights, and so in the index
+        w = pygeoda.distance_weights(self.nat, dist_km, is_arc=True, is_mile=False, use_index=True)
+        w2 = pygeoda.distance_weights(self.nat, dist_km, is_arc=True, is_mile=False)
+        self.assertTrue(w.is_symmetric())
+        for i in range(3085):
+            self.assertEqual(list(w.get_neighbors(i)), sorted(w2.get_neighbors(i)))
+
+    def test_min_distthreshold_index(self):
+        dist_thres = pygeoda.min_distthreshold(self.nat, use_index=True, cpu_threads=2)
+        nn_dists = self.nat.spatial_index().nn_distances()
+
+        self.assertEqual(len(nn_dists), 3085)
+        self.assertEqual(nn_dists.max(), dist_thres)
+        self.assertIs(self.nat.spatial_index().nn_distances(), nn_dists)
+        self.assertEqual(pygeoda.min_distthreshold(self.nat), pygeoda.min_distthreshold(self.nat))
+
+        # the cached distances give exactly the threshold of libgeoda
+        self.assertEqual(pygeoda.min_distthreshold(self.nat, use_index=True), dist_thres)
+        self.assertEqual(dist_thres, pygeoda.libgeoda.gda_min_distthreshold(self.nat.gda, False, True))
+        self.assertEqual(pygeoda.distance_weights(self.nat, dist_thres).min_neighbors(), 1)
+        for path in ("./data/natregimes.shp", "./data/Guerry.shp"):
+            gda = pygeoda.open(path)
+            for is_mile in (True, False):
+                self.assertEqual(pygeoda.min_distthreshold(gda, is_arc=True, is_mile=is_mile, use_index=True),
+                                 pygeoda.libgeoda.gda_min_distthreshold(gda.gda, True, is_mile))
+
+    def test_distance_neighbor_counts(self):
+        dist_thres = pygeoda.min_distthreshold(self.nat, use_index=True)
+        counts = pygeoda.distance_neighbor_counts(self.nat, dist_thres, cpu_threads=2)
+        w = pygeoda.distance_weights(self.nat, dist_thres, use_index=True, cpu_threads=2)
+
+        self.assertEqual(len(counts), 3085)
+        self.assertEqual(counts.min(), 1)
+        self.assertEqual(counts.max(), w.max_neighbors())
+        self.assertEqual(counts.tolist(), numpy.diff(w.to_csr()[0]).tolist())
+        with self.assertRaises(ValueError):
+            pygeoda.distance_weights(self.nat, dist_thres, max_edges=1000)
+
+        # the counts match the weights of libgeoda, and max_edges allows exactly their pairs
+        gda_thres = pygeoda.min_distthreshold(self.nat)
+        for is_arc in (False, True):
+            dist_thres = pygeoda.min_distthreshold(self.nat, is_arc=is_arc) * 1.5
+            w = pygeoda.distance_weights(self.nat, dist_thres, is_arc=is_arc)
+            counts = pygeoda.distance_neighbor_counts(self.nat, dist_thres, is_arc=is_arc)
+            self.assertEqual(counts.tolist(), [len(w.get_neighbors(i)) for i in range(3085)])
+            num_edges = int(counts.sum())
+            pygeoda.distance_weights(self.nat, dist_thres, is_arc=is_arc, max_edges=num_edges)
+            with self.assertRaises(ValueError):
+                pygeoda.distance_weights(self.nat, dist_thres, is_arc=is_arc, max_edges=num_edges - 1)
+
+        # without the centroids the neighbors are not counted
+        gda = pygeoda.open("./data/natregimes.shp", columns=["HR60"])
+        w = pygeoda.distance_weights(gda, gda_thres, max_edges=1000)
+        self.assertEqual(w.min_neighbors(), 1)
+
+    def test_weights_set_operations(self):
+        queen = pygeoda.queen_weights(self.nat)
+        knn = pygeoda.knn_weights(self.nat, 6)
+
+        both = queen.intersection(knn, cpu_threads=2)
+        either = queen.union(knn, cpu_threads=2)
+        only_queen = queen.difference(knn, cpu_threads=2)
+        for i in range(0, 3085, 100):
+            q, k = set(queen.get_neighbors(i)), set(knn.get_neighbors(i))
+            self.assertEqual(set(both.get_neighbors(i)), q & k)
+            self.assertEqual(set(either.get_neighbors(i)), q | k)
+            self.assertEqual(set(only_queen.get_neighbors(i)), q - k)
+
+        sym = knn.symmetrize()
+        self.assertFalse(knn.is_symmetric())
+        self.assertTrue(sym.is_symmetric())
+        self.assertEqual(sym.min_neighbors(), 6)
+
+    def test_knn_weights_multi(self):
+        ws = pygeoda.knn_weights_multi(self.nat, [4, 8])
+
+        self.assertEqual(len(ws), 2)
+        self.assertEqual(ws[0].max_neighbors(), 4)
+        self.assertEqual(ws[1].min_neighbors(), 8)
+        w = pygeoda.knn_weights(self.nat, 4)
+        for i in range(3085):
+            self.assertEqual(sorted(ws[0].get_neighbors(i)), sorted(w.get_neighbors(i)))
+            self.assertTrue(set(ws[0].get_neighbors(i)) <= set(ws[1].get_neighbors(i)))
+
+        # the arc neighbors are the ones of libgeoda too
+        ws = pygeoda.knn_weights_multi(self.nat, [4], is_arc=True)
+        w = pygeoda.knn_weights(self.nat, 4, is_arc=True)
+        for i in range(3085):
+            self.assertEqual(sorted(ws[0].get_neighbors(i)), sorted(w.get_neighbors(i)))
+
     def test_knn2_weights(self):
         k = 6
         w = pygeoda.knn_weights(self.nat, k, power = 2.0, is_inverse = True, is_arc = True, is_mile = False)
@@ -120,6 +494,10 @@ class TestWeights(unittest.TestCase):
         self.assertFalse(w.is_symmetric())
         self.assertAlmostEqual(w.weights_sparsity(), 0.0038897893030)
 
+    def test_kernel_knn_weights_threads(self):
+        with self.assertRaises(ValueError):
+            pygeoda.kernel_knn_weights(self.nat, 12, "gaussian", cpu_threads=3)
+
     def test_kernel_distband_weights(self):
         bandwidth = pygeoda.min_distthreshold(self.nat)
         kernel = "triangular"